@@ -18,6 +18,8 @@ Typical usage example:
 
 import json
 import os
+import csv
+import base64
 import sys
 import urllib.request
 import subprocess
@@ -25,20 +27,56 @@ import tarfile
 import re
 import shutil
 import time
+import tempfile
+import sysconfig
+import hashlib
+import threading
+import concurrent.futures
 import requests
+import urllib3
 from pathlib import Path
-from io import StringIO
-import glob
+from io import StringIO, BytesIO
 if(os.name == "posix"):
     import readline
 termtype = "plain"
 modi_version = "v0.7.5"
+install_value_flags = ["--jobs", "--wheelhouse"]
+download_buffer_size = 4 * 1024 * 1024
+download_attempts = 5
+download_segment_size = 8 * 1024 * 1024
+download_checkpoint_size = 4 * 1024 * 1024
+link_stub = """# Generated by Modi. `import modi_links` makes the packages listed in modi_links.pth importable
+import os
+import site
+import sys
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "modi_links.pth")) as pth:
+    paths = [line.strip() for line in pth if line.strip() != ""]
+# Put the linked trees first, like the project directory in copy mode, so they win over site-packages
+sys.path[:] = [*paths, *[entry for entry in sys.path if entry not in paths]]
+for path in paths:
+    site.addsitedir(path)
+"""
+trace_phases = ["resolve", "download", "build", "copy", "extract", "cleanup"]
+pip_phase_patterns = [
+    ("resolve", re.compile(r"^\s*(Collecting|Requirement already satisfied|Looking in|Would install) ")),
+    ("download", re.compile(r"^\s*(Downloading|Using cached|File was already downloaded|Processing|Saved) ")),
+    ("build", re.compile(r"^\s*(Installing build dependencies|Getting requirements to build|Preparing metadata|Building wheels? for|Created wheel for|Stored in directory|Running setup\.py)")),
+    ("extract", re.compile(r"^\s*Installing collected packages")),
+]
 try:
     import rich
     import rich.progress
     termtype = "rich"
 except ImportError:
     termtype = "plain"
+try:
+    from packaging.requirements import Requirement, InvalidRequirement
+except ImportError:
+    try:
+        from pip._vendor.packaging.requirements import Requirement, InvalidRequirement
+    except ImportError:
+        Requirement = None
 
 def check_IDLE():
     return("idlelib" in sys.modules)
@@ -176,6 +214,137 @@ class Config:
             file.write(json.dumps(self.obj, indent=4, sort_keys=True))
 
 
+class HashingReader:
+    """Wrap a binary stream and keep a running SHA-256 of everything read from it"""
+    def __init__(self, stream):
+        self.stream = stream
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.digest.update(data)
+        return data
+
+    def drain(self, chunk_size=1024 * 1024):
+        while len(self.read(chunk_size)) > 0:
+            pass
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+
+class DownloadProgress:
+    """Show download progress, redrawn at most every 'interval' seconds however often it is advanced"""
+    def __init__(self, termtype, label, total=None, interval=0.1, verb="Downloading"):
+        self.label = label
+        self.verb = verb
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.last_draw = 0.0
+        self.lock = threading.Lock()
+        self.bar = None
+        if(termtype == "rich"):
+            self.bar = rich.progress.Progress(*rich.progress.Progress.get_default_columns(), rich.progress.DownloadColumn(), rich.progress.TransferSpeedColumn(), transient=True, auto_refresh=False)
+            self.task = self.bar.add_task(f"    {verb} {label}...", total=total)
+            self.bar.start()
+
+    def advance(self, size):
+        with self.lock:
+            self.done += size
+            now = time.perf_counter()
+            if(now - self.last_draw >= self.interval):
+                self.last_draw = now
+                self.draw()
+
+    def draw(self):
+        if(self.bar is not None):
+            self.bar.update(self.task, completed=self.done)
+            self.bar.refresh()
+            return
+        if(self.total):
+            blocks = min(50, int(self.done / self.total * 50))
+            sys.stdout.write(f"\r    {self.verb} '{self.label}': [{'█' * blocks}{' ' * (50 - blocks)}] {blocks * 2}%")
+        else:
+            sys.stdout.write(f"\r    {self.verb} '{self.label}': {self.done / (1024 * 1024):.1f} MiB")
+        sys.stdout.flush()
+
+    def close(self):
+        with self.lock:
+            self.draw()
+        if(self.bar is not None):
+            self.bar.stop()
+        else:
+            sys.stdout.write("\n")
+
+
+class MultipartFile:
+    """Present a file on disk as a multipart/form-data body that is read in chunks rather than loaded into memory"""
+    def __init__(self, path, field="file", progress=None):
+        import uuid
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.progress = progress
+        head = f'--{self.boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self.file = open(path, "rb")
+        self.length = len(head) + os.path.getsize(path) + len(tail)
+        self.parts = [BytesIO(head), self.file, BytesIO(tail)]
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        data = b""
+        while len(self.parts) > 0 and (size < 0 or len(data) < size):
+            chunk = self.parts[0].read(size - len(data) if size >= 0 else -1)
+            if(len(chunk) == 0):
+                self.parts.pop(0)
+                continue
+            data += chunk
+        if(self.progress is not None):
+            self.progress.advance(len(data))
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+class Tracer:
+    """Collect timed spans per phase and package, exported as Chrome trace events"""
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def add(self, phase, start, end, pkg="", name=""):
+        event = {
+            "name": name or phase,
+            "cat": phase,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6),
+            "dur": round((end - start) * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"package": pkg},
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def write(self, path):
+        with open(path, "w") as file:
+            file.write(json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"}))
+
+    def summary(self):
+        totals = {}
+        for event in self.events:
+            if(event["cat"] not in trace_phases):
+                continue
+            row = totals.setdefault(event["args"]["package"] or "-", dict.fromkeys(trace_phases, 0.0))
+            row[event["cat"]] += event["dur"] / 1e6
+        return sorted(totals.items(), key=lambda item: sum(item[1].values()), reverse=True)
+
+
 def clear(self): 
     if(os.name != "posix"):
         os.system('cls')
@@ -189,6 +358,11 @@ class Modi:
         self.console = Output(termtype, loudness)
         self.termtype = termtype
         self.logged_in = False
+        self.store_lock = threading.Lock()
+        self.journal_lock = threading.Lock()
+        self.wheelhouse = ""
+        self.pypi_meta = {}
+        self.tracer = None
         try:
             file = open(f"{self.env_home}/.modi.json", "r")
             file.close()
@@ -200,6 +374,7 @@ class Modi:
                 json_conf = {"cache": {"path": str(filepath)}, "projects": {}}
                 conf.write(json.dumps(json_conf))
         self.config = Config(Path(f"{self.env_home}/.modi.json"))
+        self.wheelhouse = self.config.obj.get("wheelhouse", "")
         self.site_prefix = ""
         if(os.name != "posix"):
             self.windows = True
@@ -340,11 +515,16 @@ class Modi:
                 correct_file = valid_files[0]
 
             self.console.log(f"Uploading package {self.__fmt_style(correct_file, 'bold orchid1')} to {self.config.obj['remote']}")
-            file_hdl = open(correct_file, 'rb')
-            files = {'file': file_hdl.read()}
+            body = MultipartFile(correct_file)
+            progress = DownloadProgress(self.termtype, self.__fmt_style(correct_file, 'bold orchid1'), len(body), verb="Uploading")
+            body.progress = progress
             url = f"{self.config.obj['remote']}/upload/{package_name}"
-            headers = {'Authorization': self.config.obj['auth']['token'], 'X-Modi-Username': self.config.obj['auth']['username']}
-            res = requests.put(url, files=files, headers=headers)
+            headers = {'Authorization': self.config.obj['auth']['token'], 'X-Modi-Username': self.config.obj['auth']['username'], 'Content-Type': body.content_type}
+            try:
+                res = requests.put(url, data=body, headers=headers)
+            finally:
+                body.close()
+                progress.close()
             finish_time = time.perf_counter()
             total_time = str(round(finish_time - start_time, 1))
 
@@ -365,7 +545,8 @@ class Modi:
             
             url = f"{self.config.obj['remote']}/package/{package_name}"
             self.console.log(f"Downloading package '{package_name}' from remote")
-            self.__download_progress(url)
+            if(self.__download_progress(url) != 0):
+                return 1
             finish_time = time.perf_counter()
             total_time = str(round(finish_time - start_time, 1))
             self.console.log(f"Successfully downloaded package {self.__fmt_style(package_name, 'bold light_sky_blue1')} from remote {self.config.obj['remote']} in {total_time} seconds", mtype="completion")
@@ -663,11 +844,18 @@ class Modi:
             inst_args.append(pkg)
         return self.install(inst_args, return_deps=return_deps, no_projects=no_projects)
 
-    def install(self, args, return_deps=False, no_projects=True):
+    def install(self, args, return_deps=False, no_projects=True, batch=True, jobs=1, lock=None, link=False, precompile=True):
         """Install a package available from PyPi, either to the global cache or to the CWD
 
         Args:
             *args: a list of packages to install from PyPi, optionally with "local" as the first parameter which indicates that local mode should be used (variadic)
+            batch (bool): Whether to resolve and install all PIP-mode packages in a single pip run before falling back to one-by-one installs
+            jobs (int): The number of packages to install at once, each in its own staging prefix. Can also be given as '--jobs N' in *args
+            '--restart' in *args: Discard the journal of an interrupted install instead of resuming it
+            precompile (bool): In local mode, byte-compile the installed modules on all cores once they are in place. Can be turned off with '--no-compile' in *args
+            link (bool): In local mode, keep packages in version-pinned directories in the Modi cache and point the project at them with modi_links.pth instead of copying them. Can also be given as '--link' in *args
+            '--wheelhouse <dir>' in *args: Install only from a local directory of wheels/sdists (or a file:// simple index), never touching the network
+            lock (str): The path of a modi.lock file to install from with 'local auto', even if it doesn't match ./requirements.txt
 
         Returns:
             1: if the method failed to install any one of the requested packages
@@ -687,23 +875,41 @@ class Modi:
             args = args[0]
         else:
             pass
+        args, flags = self.__parse_flags(args, value_flags=install_value_flags)
+        if(len(args) == 0):
+            return 1
+        self.wheelhouse = flags.get("--wheelhouse", self.config.obj.get("wheelhouse", ""))
+        try:
+            jobs = int(flags.get("--jobs", jobs))
+        except ValueError:
+            self.console.log("Error: '--jobs' must be given a whole number", mtype="error")
+            return 1
+        link = link or "--link" in flags
+        precompile = precompile and "--no-compile" not in flags
         local = False
         cwd = ""
+        lock_obj = None
         self.packages = []
         if args[0] == "local":
             local = True
             cwd = str(Path(os.getcwd()))
             if(len(args) > 1):
-                if(args[1] == "auto" or args[1] == "all"):
+                if((args[1] == "auto" or args[1] == "all") and lock is not None):
+                    lock_obj = self.__read_lock(lock)
+                    if(lock_obj is None):
+                        return 1
+                    self.packages = lock_obj["requirements"]
+                elif(args[1] == "auto" or args[1] == "all"):
                     try:
-                        with open(Path("./requirements.txt"), "r") as reqs:
-                            for line in reqs.readlines():
-                                line = line.strip()
-                                if(line[0] != "-" and line[0] != "." and line != ""):
-                                    self.packages.append(line.split("=")[0])
+                        self.packages = self.__read_requirements(Path("./requirements.txt"))
                     except FileNotFoundError:
                         self.console.log("Error: could not find ./requirements.txt while attempting autoinstall", mtype="error")
                         return 1
+                    if(os.path.exists(Path("./modi.lock"))):
+                        lock_obj = self.__read_lock(Path("./modi.lock"))
+                        if(lock_obj is not None and sorted(lock_obj["requirements"]) != sorted(self.packages)):
+                            self.console.log(f"modi.lock is out of date with ./requirements.txt, ignoring it. Run {self.__fmt_code('modi.py lock')} to update it.", mtype="warning")
+                            lock_obj = None
                 else:
                     self.packages = args[1:]
             else:
@@ -712,17 +918,68 @@ class Modi:
             cwd = str(Path(self.config.obj["cache"]["path"]))
             self.packages = args
         self.prefix = cwd
+        manifest = None
+        if(local):
+            manifest = Config(Path(f"{cwd}/modi.manifest.json"))
+            if(not return_deps and self.__manifest_current(manifest, self.packages)):
+                self.console.log(f"All requested packages are already installed in {cwd} and unchanged, nothing to do", mtype="completion")
+                return 0
+
+        self.requested_names = set(self.__requirement_name(pkg) for pkg in self.packages)
+        self.package_names = [re.split(r"[\s<>=!~;\[@]", pkg.lstrip("@"), maxsplit=1)[0] for pkg in self.packages]
+        dist_index = None
+        if(local):
+            self.dist_index = {}
+        else:
+            dist_index = Config(Path(f"{cwd}/modi.index.json"))
+            self.dist_index = dist_index.obj
+        for name in self.__index_new_dists():
+            self.dist_index["dists"][name]["requested"] = True
+
+        link = link and local
+        satisfied = []
+        if(lock_obj is None and not return_deps):
+            if(link):
+                satisfied = self.__satisfied(self.packages, self.__link_candidates(manifest))
+            elif(local):
+                intact = self.__intact_dists(manifest)
+                satisfied = self.__satisfied(self.packages, {name: dist for name, dist in manifest.obj.get("dists", {}).items() if name in intact})
+            else:
+                satisfied = self.__satisfied(self.packages, self.dist_index["dists"])
+            if(len(satisfied) == len(self.packages)):
+                if(link):
+                    manifest.obj["requested"] = sorted(set([*manifest.obj.get("requested", []), *self.packages]))
+                    self.__write_links(manifest, self.__link_candidates(manifest))
+                    manifest.write()
+                    self.console.log(f"All requested packages are already in the Modi cache, linked them into {cwd}", mtype="completion")
+                    return 0
+                self.console.log(f"All requested packages are already satisfied in {cwd}, nothing to do", mtype="completion")
+                return 0
+            if(len(satisfied) > 0):
+                self.console.log(f"Skipping {len(satisfied)} already satisfied requirement(s): {', '.join(satisfied)}", mtype="message")
 
         setup_py_queue = []
-        pkg_count = len(self.packages)
+        pkg_count = len(self.packages) - len(satisfied)
         self.total_deps = 0
         start_time = time.perf_counter()
         pkgs_failed = 0
+        done = self.__journal_start(local, "--restart" in flags)
+        pending = [pkg for pkg in self.packages if pkg not in done and pkg not in satisfied]
+        if(lock_obj is not None):
+            pending = self.__install_lock(local, lock_obj, manifest)
+            if(len(pending) == 0):
+                self.__journal_done(*self.packages)
+        elif(jobs > 1):
+            pending, pkgs_failed = self.__install_parallel(local, jobs, pending)
+        elif(batch):
+            pending = self.__install_pip_batch(local, pending)
+
+        self.__prefetch_metadata([self.__requirement_name(pkg) for pkg in pending if pkg[0] == "@"])
 
         global termtype
         if(termtype == "rich"):
             count = 0
-            for pkg in rich.progress.track(self.packages, description="    Downloading & Building...", transient=True):
+            for pkg in rich.progress.track(pending, description="    Downloading & Building...", transient=True):
 
                 dep_count = 0
                 mode = "PIP"
@@ -737,9 +994,10 @@ class Modi:
                     self.console.log(f"{verb} package '{pkg}' with PIP", mtype="message")
                     res = self.__install_pip(pkg)
                     count += 1
-                    dep_count = len(glob.glob(str(Path(f"{self.prefix}/{self.site_prefix}/*[!info]")))) - count - self.total_deps
+                    dep_count = self.__count_new_deps()
                     self.total_deps += dep_count
                     if(res == 0):
+                        self.__journal_done(pkg)
                         if(self.prefix == str(Path(os.getcwd()))):
                             self.console.log(f"Downloaded package '{pkg}' and {str(dep_count)} dependencies", mtype="completion")
                         else:
@@ -751,30 +1009,17 @@ class Modi:
                     self.console.log("Using legacy setuptools mode, dependencies will have to be installed manually", mtype="warning")
                     self.console.log(f"{verb} package '{pkg}' with setuptools", mtype="message")
                     res = self.__install_setuptools(pkg)
-                    if(res == 1 or pkg not in os.listdir(f"{self.prefix}/{self.site_prefix}")):
+                    if(res == 1 or not self.__setuptools_installed(pkg, self.prefix)):
                         self.console.log("Error: failed to install package '" + pkg + "'", mtype="error")
                         pkgs_failed += 1
                     else:
+                        self.__journal_done(f"@{pkg}")
                         if(local):
                             self.console.log(f"Downloaded and built package '{pkg}'", mtype="message")
                         else:
                             self.console.log(f"Installed package '{pkg}'", mtype="message")
-            if(len(setup_py_queue) > 0):
-                self.console.log("Some packages failed to install correctly, trying with setuptools", mtype="warning")
-            for pkg in rich.progress.track(setup_py_queue, description="    Downloading & Building...", transient=True):
-                self.console.log("Using legacy setuptools mode, dependencies will have to be installed manually", mtype="warning")
-                self.console.log(f"{verb} package '{pkg}' with setuptools", mtype="message")
-                res = self.__install_setuptools(pkg)
-                if(res == 1 or pkg not in os.listdir(f"{self.prefix}/{self.site_prefix}")):
-                    self.console.log("Error: failed to install package '" + pkg + "'", mtype="error")
-                    pkgs_failed += 1
-                else:
-                    if(local):
-                        self.console.log(f"Downloaded and built package '{pkg}'", mtype="message")
-                    else:
-                        self.console.log(f"Installed package '{pkg}'", mtype="message")
         else:
-            for pkg in self.packages:
+            for pkg in pending:
                 mode = "PIP"
                 if(pkg[0] == "@"):
                     mode = "SETUPTOOLS"
@@ -782,22 +1027,79 @@ class Modi:
                 self.console.log(f"Installing package {pkg}", mtype="message")
                 if(mode == "PIP"):
                     res = self.__install_pip(pkg)
+                    self.total_deps += self.__count_new_deps()
                     if(res == 1):
                         setup_py_queue.append(pkg)
+                    else:
+                        self.__journal_done(pkg)
                 else:
                     res = self.__install_setuptools(pkg)
                     if(res == 1):
                         self.console.log("Error: failed to install package " + pkg, mtype="error")
                         pkgs_failed += 1
                     else:
+                        self.__journal_done(f"@{pkg}")
                         self.console.log(f"Installed package {pkg}", mtype="message")
+
+        # Requirements PIP could not install get one more try with setuptools, whichever terminal is in use
+        if(len(setup_py_queue) > 0):
+            self.console.log("Some packages failed to install correctly, trying with setuptools", mtype="warning")
+            self.__prefetch_metadata([self.__requirement_name(pkg) for pkg in setup_py_queue])
+        verb = "Installing"
+        if(local):
+            verb = "Downloading"
+        queue = setup_py_queue
+        if(termtype == "rich"):
+            queue = rich.progress.track(setup_py_queue, description="    Downloading & Building...", transient=True)
+        for pkg in queue:
+            self.console.log("Using legacy setuptools mode, dependencies will have to be installed manually", mtype="warning")
+            self.console.log(f"{verb} package '{pkg}' with setuptools", mtype="message")
+            res = self.__install_setuptools(pkg)
+            if(res == 1 or not self.__setuptools_installed(pkg, self.prefix)):
+                self.console.log("Error: failed to install package '" + pkg + "'", mtype="error")
+                pkgs_failed += 1
+            else:
+                self.__journal_done(pkg)
+                if(local):
+                    self.console.log(f"Downloaded and built package '{pkg}'", mtype="message")
+                else:
+                    self.console.log(f"Installed package '{pkg}'", mtype="message")
+
+        # Only packages that actually made it in count as requested, so a failed one is retried next time
+        installed = [pkg for pkg in self.packages if pkg in satisfied or pkg in self.journal.obj["done"]]
+        installed_names = set(self.__requirement_name(pkg) for pkg in installed)
+        self.__index_new_dists()
+        for name in installed_names:
+            if(name in self.dist_index["dists"]):
+                self.dist_index["dists"][name]["requested"] = True
+        if(dist_index is not None):
+            dist_index.write()
         final_deps = []
         final_pkgs = []
-        if(local):
+        if(local and os.path.exists(Path(f"{os.getcwd()}/{self.site_prefix}"))):
+            phase_start = time.perf_counter()
+            linked = {}
+            created = []
+            if(link):
+                linked, created = self.__link_dists(Path(f"{os.getcwd()}/{self.site_prefix}"))
+            if(precompile):
+                # Compile in the staging prefix, embedding the project paths, so the manifest records the final .pyc files
+                self.__precompile([Path(f"{os.getcwd()}/{self.site_prefix}")], ddir=os.getcwd())
+                # Link trees are shared between projects, only compile the ones this install created
+                self.__precompile(created)
             if(return_deps):
-                final_deps, final_pkgs = self.__copy_local(str(Path(f"{os.getcwd()}/{self.site_prefix}")), "./", return_deps=True)
+                final_deps, final_pkgs = self.__copy_local(str(Path(f"{os.getcwd()}/{self.site_prefix}")), "./", return_deps=True, manifest=manifest)
             else:
-                self.__copy_local(str(Path(f"{os.getcwd()}/{self.site_prefix}")), "./")
+                self.__copy_local(str(Path(f"{os.getcwd()}/{self.site_prefix}")), "./", manifest=manifest)
+            manifest.obj["requested"] = sorted(set([*manifest.obj.get("requested", []), *installed]))
+            if(link):
+                self.__write_links(manifest, {**self.__link_candidates(manifest), **linked})
+            for name, dist in manifest.obj["dists"].items():
+                if(name in installed_names):
+                    dist["requested"] = True
+            manifest.write()
+            self.__trace("copy", phase_start, name="copy into project")
+            phase_start = time.perf_counter()
             shutil.rmtree(Path("./lib"))
             try:
                 shutil.rmtree(Path("./scripts"))
@@ -807,6 +1109,9 @@ class Modi:
                 shutil.rmtree(Path("./bin"))
             except:
                 pass
+            self.__trace("cleanup", phase_start, name="remove staging prefix")
+        if(pkgs_failed == 0):
+            self.__journal_finish()
         finish_time = time.perf_counter()
         total_time = str(round(finish_time - start_time, 1))
         pkg_count = str(pkg_count)
@@ -831,6 +1136,56 @@ class Modi:
             return 1
         return 0
 
+    def lock(self, args=[]):
+        """Resolve the project's requirements once and pin them to modi.lock
+
+        Args:
+            args (list): A list of requirements to lock. Defaults to ./requirements.txt, then the dependencies in modi.meta.json
+        Returns:
+            1: If the requirements could not be resolved
+            0: If modi.lock was written successfully
+        """
+        start_time = time.perf_counter()
+        requirements, flags = self.__parse_flags(args, value_flags=install_value_flags)
+        self.wheelhouse = flags.get("--wheelhouse", self.config.obj.get("wheelhouse", ""))
+        if(len(requirements) == 0):
+            try:
+                requirements = self.__read_requirements(Path("./requirements.txt"))
+            except FileNotFoundError:
+                try:
+                    with open(Path("./modi.meta.json"), "r") as meta_file:
+                        requirements = json.loads(meta_file.read())["dependencies"]
+                except (FileNotFoundError, KeyError):
+                    pass
+        if(len(requirements) == 0):
+            self.console.log("Error: no requirements to lock. Add some to ./requirements.txt or pass them as arguments", mtype="error")
+            return 1
+        self.console.log(f"Resolving {len(requirements)} requirements")
+        report_dir = tempfile.mkdtemp(prefix=".modi-lock-")
+        report_path = Path(f"{report_dir}/report.json")
+        res = self.__run_pip([sys.executable, "-m", "pip", "install", "--dry-run", "--quiet", "--ignore-installed", "--report", str(report_path), *self.__pip_index_args(), *[req.lstrip("@") for req in requirements]], "modi.lock")
+        if(res.returncode != 0 or not os.path.exists(report_path)):
+            shutil.rmtree(report_dir, ignore_errors=True)
+            self.console.log("Error: could not resolve requirements. Locking needs pip 22.2 or newer", mtype="error")
+            return 1
+        with open(report_path, "r") as report_file:
+            report = json.loads(report_file.read())
+        shutil.rmtree(report_dir, ignore_errors=True)
+        packages = []
+        for item in report["install"]:
+            download_info = item["download_info"]
+            archive_info = download_info.get("archive_info", {})
+            digest = archive_info.get("hashes", {}).get("sha256", "")
+            if(digest == "" and archive_info.get("hash", "").startswith("sha256=")):
+                digest = archive_info["hash"][len("sha256="):]
+            packages.append({"name": self.__normalise_name(item["metadata"]["name"]), "version": item["metadata"]["version"], "url": download_info["url"], "sha256": digest, "requested": item.get("requested", False)})
+        lock_obj = {"lock_version": 1, "python": self.__python_tag(), "requirements": requirements, "packages": sorted(packages, key=lambda pkg: pkg["name"])}
+        with open(Path("./modi.lock"), "w") as lock_file:
+            lock_file.write(json.dumps(lock_obj, indent=4, sort_keys=True))
+        total_time = round(time.perf_counter() - start_time, 1)
+        self.console.log(f"Locked {len(packages)} packages for {len(requirements)} requirements to modi.lock in {total_time} seconds", mtype="completion")
+        return 0
+
     def help(self, name=""):
         """Print usage help information to stdout, for interactive-mode commands.
         
@@ -838,7 +1193,7 @@ class Modi:
             name (str): the name of a command to help with. Defaults to "", which shows basic help
         """
         self.console.log(f"{self.__fmt_style('MODI Help:', 'bold')}", mtype="info")
-        if name not in ["install", "help", "remove", "build", "bootstrap", "project", "shell", "remote", "setup", "add", "gui", "self", "demo", "logo"]:
+        if name not in ["install", "help", "remove", "build", "bootstrap", "project", "shell", "remote", "setup", "add", "gui", "self", "demo", "logo", "lock"]:
             self.console.log(f"- {self.__fmt_code('modi.py install [args]')}  : Install one or more packages", mtype="info")
             self.console.log(f"- {self.__fmt_code('modi.py build [args]')}    : Build a Modi package in the CWD", mtype="info")
             self.console.log(f"- {self.__fmt_code('modi.py bootstrap [args]')}: Bootstrap a directory from the contents of a Modi package", mtype="info")
@@ -849,15 +1204,26 @@ class Modi:
             self.console.log(f"- {self.__fmt_code('modi.py self [args]')}     : Run common commands that modify Modi itself", mtype="info")
             self.console.log(f"- {self.__fmt_code('modi.py gui [args]')}      : Launch the Modi GUI, for easier package management", mtype="info")
             self.console.log(f"- {self.__fmt_code('modi.py add [args]')}      : Install one or more packages and add to project requirements", mtype="info")
+            self.console.log(f"- {self.__fmt_code('modi.py lock [args]')}     : Pin the exact versions of all requirements in modi.lock", mtype="info")
             self.console.log(f"- {self.__fmt_code('modi.py help [cmd]')}      : Shows the help page, either this or the detailed view for [cmd]", mtype="info")
+            self.console.log(f"  > Add {self.__fmt_code('--trace <out.json>')} to install, build, bootstrap or self sync to time each resolve/download/build/copy/extract/cleanup phase per package. The trace opens in chrome://tracing or Perfetto.", mtype="info")
         elif name == "install":
             self.console.log(f"- {self.__fmt_code('modi.py install <package> [package] [...]')}         : Installs one or more packages to the global MODI cache (by default @ ~/.modi_cache)", mtype="info")
             self.console.log(f"  > {self.__fmt_code('modi.py install @<package> [package] [...]')}      : Same as above, but forcing use of the setuptools install method. Use if the previous option isn't working.", mtype="info")
             self.console.log(f"- {self.__fmt_code('modi.py install local <package> [package] [...]')}   : Installs one or more packages to the current working directory. This means they can be directly imported using `import <package>`", mtype="info")
             self.console.log(f"  > {self.__fmt_code('modi.py install local @<package> [package] [...]')}: Same as above, but forcing use of the setuptools install method. Use if the previous option isn't working.", mtype="info")
+            self.console.log(f"- {self.__fmt_code('modi.py install --jobs <n> [local] <package> [...]')}  : Installs up to <n> packages at once, each in its own staging directory, then merges the results.", mtype="info")
+            self.console.log(f"- {self.__fmt_code('modi.py install --restart [local] <package> [...]')}       : Interrupted installs resume from the first unfinished package. Use --restart to start from scratch instead.", mtype="info")
+            self.console.log(f"- {self.__fmt_code('modi.py install --wheelhouse <dir> [local] <package> [...]')}: Installs only from a local directory of wheels/sdists (or a file:// simple index), without touching the network. Set \"wheelhouse\" in ~/.modi.json to make this the default.", mtype="info")
+            self.console.log(f"- {self.__fmt_code('modi.py install local --link <package> [...]')}     : Keeps packages in version-pinned directories in the Modi cache (~/.modi_cache/links) instead of copying them into the CWD. Add {self.__fmt_code('import modi_links')} before other imports to use them.", mtype="info")
+            self.console.log(f"  > Note: installed modules are byte-compiled on all cores after {self.__fmt_code('install local')}, {self.__fmt_code('bootstrap')} and {self.__fmt_code('self sync')}. Pass {self.__fmt_code('--no-compile')} to skip this.", mtype="info")
+            self.console.log(f"  > Note: requirements may carry version specifiers (e.g. 'requests>=2.28'). Requirements already satisfied by the packages in the CWD or cache are skipped.", mtype="info")
+            self.console.log(f"  > Note: PyPI metadata is cached in ~/.modi_cache/metadata and revalidated after \"ttl\" seconds (default 600). Both \"ttl\" and \"max_size\" (in bytes) can be set under \"metadata\" in ~/.modi.json.", mtype="info")
+            self.console.log(f"  > Note: built wheels are kept in the Modi cache (by default @ ~/.modi_cache/store), so packages already built once are installed without the network. Packages built with setuptools are kept in ~/.modi_cache/builds the same way. Set \"store\" to false under \"cache\" in ~/.modi.json to disable both.", mtype="info")
         elif name == "remove":
             self.console.log(f"- {self.__fmt_code('modi.py remove <package> [package] [...]')}        : Removes one or more packages from the global MODI cache.", mtype="info")
             self.console.log(f"  > {self.__fmt_code('modi.py remove local <package> [package] [...]')}: Removes one or more packages from the current working directory.", mtype="info")
+            self.console.log(f"  > {self.__fmt_code('modi.py remove [local] --orphans <package> [...]')}: Same as above, but also removes dependencies that no remaining package needs.", mtype="info")
             self.console.log(f"  > {self.__fmt_code('modi.py remove local all')}                      : Removes all packages and subdirectories in the CWD, leaving only python files (and some special directories such as `.git`", mtype="info")
         elif name == "build":
             self.console.log(f"- {self.__fmt_code('modi.py build freeze <output_type> [pkg_name]')} : Builds a compressed archive in the format <output_type> ('tar', 'zip' or 'modi' - 'modi' is preferred) from the contents of the CWD. The pkg_name will be prompted if it is not given", mtype="info")
@@ -890,12 +1256,17 @@ class Modi:
             self.console.log(f"- {self.__fmt_code('modi.py remote bootstrap <pkg_name>')} : Bootstraps a project from a remote package instead of a local one. Note - this will remove all files in the CWD, except modi.py", mtype="info")
         elif name == "self":
             self.console.log(f"- {self.__fmt_code('modi.py self sync')} : Updates Modi itself, pulling from the latest version in the remote repository (must be set with {self.__fmt_code('modi.py remote set <url>')}.", mtype="info")
+            self.console.log(f"  > Note: packages built with {self.__fmt_code('modi.py build <mode> modi')} carry a modi.files.json of per-file hashes. If the remote serves it at /package/<name>/manifest, only changed files are fetched (from /package/<name>/file/<path>) instead of the whole package.", mtype="info")
 
         elif name == "gui":
             self.console.log(f"- {self.__fmt_code('modi.py gui')}           : Launches the Modi GUI. Note - this can also be launched by running {self.__fmt_code('gui.py')} in the Modi directory.", mtype="info")
             self.console.log(f"  > Note: {self.__fmt_style('The Modi full GUI is not yet implemented. Please use the minimal GUI until further notice.', 'bold indian_red')}", mtype="info")
             self.console.log(f"  > {self.__fmt_code('modi.py gui minimal')} : Launches the Modi Minimal GUI - this can only install packages to CWD.", mtype="info")
 
+        elif name == "lock":
+            self.console.log(f"- {self.__fmt_code('modi.py lock')}                   : Resolves ./requirements.txt (or the modi.meta.json dependencies) once and writes the exact versions, URLs and hashes to modi.lock.", mtype="info")
+            self.console.log(f"  > {self.__fmt_code('modi.py lock <package> [...]')}: Same as above, but locks the given packages instead.", mtype="info")
+            self.console.log(f"  > Note: {self.__fmt_code('modi.py install local auto')} and {self.__fmt_code('modi.py bootstrap')} install straight from modi.lock when it is present, skipping dependency resolution.", mtype="info")
         elif name == "add":
             self.console.log(f"- {self.__fmt_code('modi.py add <args>')} : Equivalent to {self.__fmt_code('modi.py install local <args>')}, but also adds the packages to 'requirements.txt' and the Modi project config, if available.", mtype="info")
 
@@ -988,6 +1359,8 @@ class Modi:
         req_pkgs = []
         current_deps = []
         proj_conf = {}
+        pkgs, flags = self.__parse_flags(pkgs, value_flags=install_value_flags)
+        flag_args = [flag if value is True else f"{flag}={value}" for flag, value in flags.items()]
         try:
             with open("requirements.txt", "r") as reqs:
                 current_deps = reqs.read().split("\n")
@@ -1006,12 +1379,12 @@ class Modi:
                 conf.write(json.dumps(proj_conf, indent=4))
             with open("requirements.txt", "a") as reqs:
                 for dep in req_pkgs:
-                    reqs.write(dep)
+                    reqs.write(dep + "\n")
         except:
             self.console.log("Error: Project files not found. Run 'modi.py project create' to create a new project in this directory", mtype="error")
         self.config.obj["projects"][proj_conf["pkg_name"]]["dependencies"] = proj_conf["dependencies"]
         self.config.write()
-        self.install_local(req_pkgs, return_deps=False, no_projects=False, add_reqs=False)
+        self.install_local([*req_pkgs, *flag_args], return_deps=False, no_projects=False, add_reqs=False)
 
     def parseargs(self, *args, shell=False):
         """Parse arguments and call appropriate functions within the class
@@ -1025,6 +1398,18 @@ class Modi:
             Nothing: if a command was run
         """
         args = args[0]
+        trace_path = None
+        for i, arg in enumerate(args):
+            if(arg.startswith("--trace=")):
+                trace_path = arg.split("=", 1)[1]
+                args = [*args[:i], *args[i + 1:]]
+                break
+            elif(arg == "--trace" and i + 1 < len(args)):
+                trace_path = args[i + 1]
+                args = [*args[:i], *args[i + 2:]]
+                break
+        if(trace_path is not None):
+            return self.__traced(args, trace_path, shell)
         if(len(args) <= 0):
             self.console.log("Error: no valid operation specified", mtype="error")
             return 1
@@ -1051,13 +1436,15 @@ class Modi:
         elif(args[0] == "build"):
             self.build(args[1:])
         elif(args[0] == "bootstrap" or args[0] == "setup"):
-            self.bootstrap(args[1])
+            self.bootstrap(args[1], precompile="--no-compile" not in args)
         elif(args[0] == "shell"):
             self.shell()
         elif(args[0] == "project"):
             self.project(args[1:])
         elif(args[0] == "add"):
             self.add(args[1:])
+        elif(args[0] == "lock"):
+            self.lock(args[1:])
         elif(args[0] == "gui"):
             self.gui(args[1:])
         elif((args[0] == "ls" or args[0] == "dir") and shell):
@@ -1068,7 +1455,7 @@ class Modi:
             self.heat(args[1:])
         elif(args[0] == "self" and len(args) > 1):
             if(args[1] == "sync"):
-                self.sync('modi')
+                self.sync('modi', precompile="--no-compile" not in args)
         else:
             self.console.log("Error: no valid operation specified", mtype="error")
             return 1
@@ -1106,13 +1493,7 @@ class Modi:
             pass
         else:
             try:
-                with open("requirements.txt", "r") as reqs:
-                    for line in reqs.readlines():
-                        line = line.strip()
-                        if(line == ""):
-                            continue
-                        if(line[0] != "-" and line[0] != "."):
-                            packages.append(line.split("=")[0])
+                packages = self.__read_requirements(Path("./requirements.txt"))
             except FileNotFoundError:
                 self.console.log("Error: 'auto' mode selected but could not find ./requirements.txt", mtype="error")
                 return 1
@@ -1214,6 +1595,8 @@ class Modi:
             else:
                 shutil.copy("modi.meta.json", Path(f"./{pkg_name}/modi.meta.json"))
                 self.console.log("Copied existing project config to tarfile")
+            if(os.path.exists(Path("./modi.lock"))):
+                shutil.copy(Path("./modi.lock"), Path(f"./{pkg_name}/modi.lock"))
             for file in final_dirs:
                 try:
                     shutil.copy(Path(f"./{file}"), Path(f"./{pkg_name}/{file}"))
@@ -1222,27 +1605,33 @@ class Modi:
                         shutil.copytree(Path(f"./{file}"), Path(f"./{pkg_name}/{file}"))
                     except:
                         self.console.log(f"Could not copy file '{file}' to compressed archive, skipping", mtype="warning")
+            with open(Path(f"./{pkg_name}/modi.files.json"), "w") as files_manifest:
+                files_manifest.write(json.dumps({"files": self.__files_manifest(Path(f"./{pkg_name}"))}, indent=4, sort_keys=True))
             tar = tarfile.open(Path(f"./{filename}.modi.pkg"), 'w:gz', compresslevel=4)
             tar.add(Path(f"./{pkg_name}"))
             tar.close()
             shutil.rmtree(Path(f"./{pkg_name}"))
             self.console.log("Finished building modi package", mtype="completion")
+        self.__trace("build", start_time, pkg_name, name=f"build {pkg_type} archive")
         if(args[0] == "auto"):
+            phase_start = time.perf_counter()
             files_to_delete = [*final_deps, *final_pkgs]
             self.console.log("Cleaning up local directory...")
             self.remove(["local", *files_to_delete], warn=False)
+            self.__trace("cleanup", phase_start, pkg_name)
             style_string = self.__fmt_style(f"{pkg_name}", 'bold light_sky_blue1')
         finish_time = time.perf_counter()
         total_time = round(finish_time - start_time, 1)
         self.console.log(f"Finished building package {style_string} in {total_time} seconds", mtype="completion")
         return 0
 
-    def sync(self, package_name):
+    def sync(self, package_name, precompile=True):
         import requests
         """Update a package from Modi Cloud
 
         Args:
             package_name (str): the name of the package to install from remtoe
+            precompile (bool): Whether to byte-compile the synced files and any locked dependencies
 
         Returns:
             0: if the package installed successfully
@@ -1251,19 +1640,46 @@ class Modi:
         start_time = time.perf_counter()
         
         url = f"{self.config.obj['remote']}/package/{package_name}"
-        self.console.log(f"Downloading package '{package_name}' from remote")
-        self.__download_progress(url)
-        finish_time = time.perf_counter()
-        total_time = str(round(finish_time - start_time, 1))
-        self.console.log(f"Successfully downloaded package {self.__fmt_style(package_name, 'bold light_sky_blue1')} from remote {self.config.obj['remote']} in {total_time} seconds", mtype="completion")
-        return self.bootstrap(package_name, cleanup=False)
+        synced = self.config.obj.setdefault("synced", {}).setdefault(self.config.obj["remote"], {})
+        previous = synced.get(package_name, {})
+        headers = {"Accept-Encoding": "identity"}
+        if(previous.get("path") == os.getcwd()):
+            if(previous.get("etag")):
+                headers["If-None-Match"] = previous["etag"]
+            if(previous.get("last_modified")):
+                headers["If-Modified-Since"] = previous["last_modified"]
+        try:
+            head = requests.head(url, headers=headers, allow_redirects=True, timeout=60)
+        except requests.exceptions.RequestException:
+            head = None
+        if(head is not None and head.status_code == 304):
+            self.console.log(f"Package {self.__fmt_style(package_name, 'bold light_sky_blue1')} is already up to date with remote {self.config.obj['remote']}", mtype="completion")
+            return 0
+        res = self.__sync_delta(url, package_name, precompile)
+        if(res is None):
+            self.console.log(f"Downloading package '{package_name}' from remote")
+            if(self.__download_progress(url) != 0):
+                return 1
+            self.__trace("download", start_time, package_name)
+            finish_time = time.perf_counter()
+            total_time = str(round(finish_time - start_time, 1))
+            self.console.log(f"Successfully downloaded package {self.__fmt_style(package_name, 'bold light_sky_blue1')} from remote {self.config.obj['remote']} in {total_time} seconds", mtype="completion")
+            res = self.bootstrap(package_name, cleanup=False, precompile=precompile)
+        elif(res == 0):
+            total_time = str(round(time.perf_counter() - start_time, 1))
+            self.console.log(f"Successfully synced package {self.__fmt_style(package_name, 'bold light_sky_blue1')} from remote {self.config.obj['remote']} in {total_time} seconds", mtype="completion")
+        if(res == 0 and head is not None and head.status_code == 200):
+            synced[package_name] = {"etag": head.headers.get("ETag", ""), "last_modified": head.headers.get("Last-Modified", ""), "path": os.getcwd()}
+            self.config.write()
+        return res
 
 
-    def bootstrap(self, package_name, cwd="", project_name="", cleanup=True):
+    def bootstrap(self, package_name, cwd="", project_name="", cleanup=True, precompile=True):
         """Bootstrap a project from a .zip, .tar.gz or (ideally) .modi.pkg file to the CWD
         
         Args:
             package_name (str): the name of the package to install, without extension
+            precompile (bool): Whether to byte-compile the project and its locked dependencies after extraction
 
         Returns:
             0: if the archive extracted successfully
@@ -1336,7 +1752,9 @@ class Modi:
             tar_hdl.extractall(Path(f"{cwd}"))
             if(file_ext != "pkg"):
                 self.console.log(f"{self.__fmt_style('Tar-GZ archive', 'bold gold1')} selected, cannot auto-generate requirements.txt", mtype="warning")
+        self.__trace("extract", start_time, package_name)
 
+        phase_start = time.perf_counter()
         pkg_contents = []
         pkg_name_bak = package_name
         if(os.path.exists(Path(f"{cwd}/{package_name}"))):
@@ -1350,12 +1768,12 @@ class Modi:
                     shutil.rmtree(Path(f"{cwd}/{file}"))
                 except NotADirectoryError:
                     os.remove(Path(f"{cwd}/{file}"))
-            try:
-                shutil.copytree(Path(f"{cwd}/{package_name}/{file}"), Path(f"{cwd}/{file}"))
-            except NotADirectoryError:
-                shutil.copy(Path(f"{cwd}/{package_name}/{file}"), Path(f"{cwd}/{file}")) 
+            self.__materialise(Path(f"{cwd}/{package_name}/{file}"), Path(f"{cwd}/{file}"))
+        self.__trace("copy", phase_start, pkg_name_bak)
 
+        phase_start = time.perf_counter()
         shutil.rmtree(Path(f"{cwd}/{package_name}"))
+        self.__trace("cleanup", phase_start, pkg_name_bak)
         package_name = pkg_name_bak
         if cleanup:
             if(Path(os.getcwd()) == cwd):
@@ -1387,7 +1805,19 @@ class Modi:
             if(file_meta != ""):
                 with open(Path(f"{cwd}/requirements.txt"), "w") as req_file:
                     for dep in final_deps:
-                        req_file.write(dep)
+                        req_file.write(dep + "\n")
+        if(os.path.exists(Path(f"{cwd}/modi.lock"))):
+            self.console.log("Installing locked dependencies from modi.lock")
+            prev_dir = os.getcwd()
+            os.chdir(cwd)
+            self.install(["local", "auto"], no_projects=False, lock=Path(f"{cwd}/modi.lock"), precompile=precompile)
+            os.chdir(prev_dir)
+        if(precompile):
+            # Installed dependencies were already compiled before their manifest entries were recorded
+            tracked = set()
+            if(os.path.exists(Path(f"{cwd}/modi.manifest.json"))):
+                tracked = set(rel.split("/")[0] for rel in Config(Path(f"{cwd}/modi.manifest.json")).obj.get("files", {}))
+            self.__precompile([Path(f"{cwd}/{file}") for file in pkg_contents if file not in tracked and (os.path.isdir(Path(f"{cwd}/{file}")) or file.endswith(".py"))])
         finish_time = time.perf_counter()
         total_time = round(finish_time - start_time, 1)
         print_string = ""
@@ -1405,16 +1835,21 @@ class Modi:
         return 0
         
 
-    def remove(self, args, local=False, warn=True):
+    def remove(self, args, local=False, warn=True, orphans=False):
         """Remove one or more packages from CWD or global cache
 
         Args:
             local (bool): Whether to operate on only the CWD. Allows use of 'all' in *args
+            orphans (bool): Whether to also remove dependencies that no remaining package needs. Can also be given as '--orphans' in *args
             *args (variadic): A list of packages to remove. If 'local' is True and args[2] is 'all', remove all subdirectories in the CWD
         Returns:
             0: Always, even if some packages failed to delete.
         """
         self.packages = []
+        args, flags = self.__parse_flags(args)
+        orphans = orphans or "--orphans" in flags
+        if(len(args) == 0):
+            return 1
         self.console.log("Removing packages", mtype="warning")
         start_time = time.perf_counter()
         if(args[0] == "local"):
@@ -1442,31 +1877,63 @@ class Modi:
             self.packages = args[1:]
             local = True
             self.prefix = os.getcwd()
+            root = Path(self.prefix)
+            index = Config(Path(f"{self.prefix}/modi.manifest.json"))
         else:
             self.packages = args
             self.prefix = self.config.obj["cache"]["path"]
+            root = Path(f"{self.prefix}{self.site_prefix}")
+            index = Config(Path(f"{self.prefix}/modi.index.json"))
+        index.obj.setdefault("dists", {})
         pkg_count = len(self.packages)
+        doomed = set()
+        removed = []
+        orphan_count = 0
         for pkg in self.packages:
-            for fd in os.listdir(Path(f"{self.prefix}")):
-                if pkg in fd:
-                    try:
-                        shutil.rmtree(Path(f"{self.prefix}/{fd}"))
-                    except NotADirectoryError:
-                        os.remove(Path(f"{self.prefix}/{fd}"))
-            if(local):
-                for fd in os.listdir(Path(f"{self.prefix}/")):
-                    if pkg in fd:
-                        try:
-                            shutil.rmtree(Path(f"{self.prefix}/{fd}"))
-                        except:
-                            os.remove(Path(f"{self.prefix}/{fd}"))
+            name = self.__requirement_name(pkg)
+            if(local and name in index.obj.get("links", {})):
+                index.obj["links"][name]["requested"] = False
+                removed.append(name)
+                continue
+            if(name in index.obj["dists"]):
+                doomed.update(self.__forget_dist(index, name, local))
+                removed.append(name)
+                continue
+            if(not os.path.isdir(root)):
+                continue
+            for fd in os.listdir(root):
+                if(fd == pkg or os.path.splitext(fd)[0] == pkg or (fd.endswith((".dist-info", ".egg-info", ".egg")) and self.__normalise_name(fd.split("-")[0]) == name)):
+                    doomed.add(fd)
+                    for rel in [rel for rel in index.obj.get("files", {}) if rel == fd or rel.startswith(f"{fd}/")]:
+                        del index.obj["files"][rel]
+        if(orphans):
+            needed = set()
+            queue = [dist_name for dist_name, dist in index.obj["dists"].items() if dist.get("requested", False)]
+            while len(queue) > 0:
+                dist_name = queue.pop()
+                if(dist_name in needed or dist_name not in index.obj["dists"]):
+                    continue
+                needed.add(dist_name)
+                queue.extend(index.obj["dists"][dist_name].get("requires", []))
+            for dist_name in [dist_name for dist_name in index.obj["dists"] if dist_name not in needed]:
+                self.console.log(f"Removing orphaned dependency '{dist_name}'", mtype="message")
+                doomed.update(self.__forget_dist(index, dist_name, local))
+                removed.append(dist_name)
+                orphan_count += 1
+        self.__delete_paths(root, doomed)
+        if("requested" in index.obj):
+            index.obj["requested"] = [req for req in index.obj["requested"] if self.__requirement_name(req) not in removed]
+        if(local and "links" in index.obj):
+            self.__write_links(index, index.obj["links"])
+        index.write()
         end_time = time.perf_counter()
         total_time = str(round(end_time - start_time, 1))
-        self.console.log(f"Removed {str(pkg_count)} packages in {total_time} seconds", mtype="completion")
+        if(orphans):
+            self.console.log(f"Removed {str(pkg_count)} packages and {orphan_count} orphaned dependencies in {total_time} seconds", mtype="completion")
+        else:
+            self.console.log(f"Removed {str(pkg_count)} packages in {total_time} seconds", mtype="completion")
         return 0
 
-
-
     # PRIVATE methods. These should NOT be called directly, they will be invoked when needed
     # | | |
     # v v v
@@ -1478,34 +1945,346 @@ class Modi:
         else:
             filename = pkg_name + ".modi.pkg"
 
-        if(self.termtype == "rich"):
-            res = requests.get(url, stream=True)
-            with open(filename, 'wb') as fd:
-                for chunk in rich.progress.track(res.iter_content(chunk_size=128), description=f"    Downloading {self.__fmt_style(pkg_name, 'bold orchid1')}...", total=int(res.headers['Content-Length']) / 128):
-                    fd.write(chunk)
+        try:
+            head = requests.head(url, headers={"Accept-Encoding": "identity"}, allow_redirects=True, timeout=60)
+        except requests.exceptions.RequestException:
+            head = None
+        if(head is not None and head.status_code != 200):
+            head = None
+        expected = self.__remote_digest(url, head)
+        downloads = Path(f"{self.config.obj['cache']['path']}/downloads")
+        if(expected != ""):
+            if(os.path.exists(filename) and self.__sha256(filename) == expected):
+                self.console.log(f"Package '{pkg_name}' is identical to {filename}, skipping the download", mtype="message")
+                return 0
+            if(os.path.exists(Path(f"{downloads}/{expected}"))):
+                self.console.log(f"Package '{pkg_name}' is unchanged since it was last downloaded, skipping the download", mtype="message")
+                # Refresh the entry so eviction treats it as recently used
+                os.utime(Path(f"{downloads}/{expected}"))
+                self.__place_file(Path(f"{downloads}/{expected}"), Path(filename))
+                return 0
+        part = Path(f"{filename}.part")
+        res = self.__download_segmented(url, part, filename, pkg_name, head, expected)
+        if(res is None):
+            res = self.__download_stream(url, part, filename, pkg_name, expected)
+        if(res == 0 and expected != ""):
+            os.makedirs(downloads, exist_ok=True)
+            self.__place_file(Path(filename), Path(f"{downloads}/{expected}"))
+            self.__evict_lru(downloads, self.config.obj.get("download", {}).get("max_size", 1024 * 1024 * 1024))
+        return res
+
+    def __files_manifest(self, root):
+        files = {}
+        for dirpath, dirs, filenames in os.walk(root):
+            for file in filenames:
+                rel = Path(os.path.relpath(Path(f"{dirpath}/{file}"), root)).as_posix()
+                if(rel != "modi.files.json"):
+                    files[rel] = {"sha256": self.__sha256(Path(f"{dirpath}/{file}")), "size": os.path.getsize(Path(f"{dirpath}/{file}"))}
+        return files
+
+    def __sync_delta(self, url, package_name, precompile=True):
+        import urllib.parse
+        try:
+            res = requests.get(f"{url}/manifest", timeout=60)
+            remote_files = res.json()["files"] if res.status_code == 200 else None
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            remote_files = None
+        local_path = Path("./modi.files.json")
+        if(remote_files is None or not os.path.exists(local_path)):
+            return None
+        local_files = Config(local_path).obj.get("files", {})
+        remote_files = {Path(os.path.normpath(rel)).as_posix(): entry for rel, entry in remote_files.items()}
+        changed = []
+        for rel, entry in remote_files.items():
+            if(rel.startswith("..") or os.path.isabs(rel)):
+                self.console.log(f"Error: remote manifest for package '{package_name}' lists an unsafe path '{rel}'", mtype="error")
+                return 1
+            if(os.path.isfile(rel)):
+                stat = os.stat(rel)
+                local = local_files.get(rel, {})
+                # Files untouched since the last sync keep the size and mtime recorded then, so only hash the rest
+                if(stat.st_size == entry["size"] and local.get("sha256") == entry["sha256"] and local.get("mtime_ns") == stat.st_mtime_ns):
+                    continue
+                if(stat.st_size == entry["size"] and self.__sha256(rel) == entry["sha256"]):
+                    continue
+            changed.append(rel)
+        removed = [rel for rel in local_files if rel not in remote_files]
+        self.console.log(f"Syncing package '{package_name}': {len(changed)} changed and {len(removed)} removed files of {len(remote_files)}")
+
+        def fetch(rel):
+            part = Path(f"{rel}.part")
+            try:
+                with requests.get(f"{url}/file/{urllib.parse.quote(rel)}", headers={"Accept-Encoding": "identity"}, stream=True, timeout=60) as res:
+                    if(res.status_code != 200):
+                        return False
+                    digest = hashlib.sha256()
+                    if(os.path.dirname(rel) != ""):
+                        os.makedirs(os.path.dirname(rel), exist_ok=True)
+                    with open(part, "wb") as fd:
+                        self.__stream_to(res.raw, fd, progress, digest)
+            except (OSError, requests.exceptions.RequestException, urllib3.exceptions.HTTPError):
+                if(os.path.exists(part)):
+                    os.remove(part)
+                return False
+            if(digest.hexdigest() != remote_files[rel]["sha256"]):
+                os.remove(part)
+                return False
+            os.replace(part, rel)
+            return True
+
+        progress = DownloadProgress(self.termtype, self.__fmt_style(package_name, 'bold orchid1'), sum(remote_files[rel]["size"] for rel in changed))
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.config.obj.get("download", {}).get("connections", 4)) as pool:
+                results = list(pool.map(fetch, changed))
+        finally:
+            progress.close()
+        if(not all(results)):
+            self.console.log(f"Delta sync of package '{package_name}' failed, downloading the whole package instead", mtype="warning")
+            return None
+        self.__delete_paths(Path("./"), removed)
+        for rel, entry in remote_files.items():
+            if(os.path.isfile(rel)):
+                entry["mtime_ns"] = os.stat(rel).st_mtime_ns
+        with open(local_path, "w") as files_manifest:
+            files_manifest.write(json.dumps({"files": remote_files}, indent=4, sort_keys=True))
+        if("modi.lock" in changed):
+            self.console.log("Installing locked dependencies from modi.lock")
+            self.install(["local", "auto"], no_projects=False, lock=Path("./modi.lock"), precompile=precompile)
+        if(precompile):
+            self.__precompile([rel for rel in changed if rel.endswith(".py")])
+        return 0
+
+    def __remote_digest(self, url, head):
+        if(head is not None and "X-Modi-SHA256" in head.headers):
+            return head.headers["X-Modi-SHA256"].strip().lower()
+        try:
+            res = requests.get(f"{url}.sha256", timeout=60)
+        except requests.exceptions.RequestException:
+            return ""
+        if(res.status_code != 200 or len(res.text.split()) == 0):
+            return ""
+        digest = res.text.split()[0].lower()
+        if(re.fullmatch(r"[0-9a-f]{64}", digest) is None):
+            return ""
+        return digest
+
+    def __download_stream(self, url, part, filename, pkg_name, expected):
+        state_path = Path(f"{part}.json")
+        for attempt in range(download_attempts):
+            offset = 0
+            state = Config(state_path)
+            if(os.path.exists(part) and state.obj.get("validator", "") != ""):
+                offset = os.path.getsize(part)
+            elif(os.path.exists(part)):
+                # Nothing to tell whether the part still matches the remote, so start over
+                os.remove(part)
+            # Ranges apply to the encoded body, so ask for it unencoded
+            headers = {"Accept-Encoding": "identity"}
+            if(offset > 0):
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = state.obj["validator"]
+            try:
+                res = requests.get(url, headers=headers, stream=True, timeout=60)
+            except requests.exceptions.RequestException:
+                self.console.log(f"Could not reach remote, retrying ({attempt + 1}/{download_attempts})", mtype="warning")
+                time.sleep(attempt)
+                continue
+            if(res.status_code == 416 or (res.status_code == 206 and self.__range_start(res) != offset)):
+                res.close()
+                os.remove(part)
+                continue
+            if(res.status_code == 200):
+                offset = 0
+                state.obj = {"validator": self.__range_validator(res)}
+                state.write()
+            elif(res.status_code != 206):
+                self.console.log(f"Error: remote returned HTTP {res.status_code} for package '{pkg_name}'", mtype="error")
+                res.close()
+                return 1
+            total = None
+            if("Content-Length" in res.headers):
+                total = offset + int(res.headers["Content-Length"])
+            if(expected == ""):
+                expected = res.headers.get("X-Modi-SHA256", "").lower()
+            digest = hashlib.sha256()
+            if(offset > 0):
+                self.console.log(f"Resuming download of '{pkg_name}' from {round(offset / (1024 * 1024), 1)} MiB")
+                with open(part, "rb") as fd:
+                    for chunk in iter(lambda: fd.read(download_buffer_size), b""):
+                        digest.update(chunk)
+            progress = DownloadProgress(self.termtype, self.__fmt_style(pkg_name, 'bold orchid1'), total)
+            progress.done = offset
+            try:
+                with open(part, "ab" if offset > 0 else "wb") as fd:
+                    self.__stream_to(res.raw, fd, progress, digest)
+            except (OSError, requests.exceptions.RequestException, urllib3.exceptions.HTTPError):
+                self.console.log(f"Download of '{pkg_name}' was interrupted, resuming ({attempt + 1}/{download_attempts})", mtype="warning")
+                continue
+            finally:
+                progress.close()
+                res.close()
+            if(total is not None and os.path.getsize(part) != total):
+                self.console.log(f"Download of '{pkg_name}' ended early, resuming ({attempt + 1}/{download_attempts})", mtype="warning")
+                continue
+            if(expected != "" and digest.hexdigest() != expected):
+                self.console.log(f"Error: download of '{pkg_name}' did not match the sha256 digest advertised by the remote", mtype="error")
+                os.remove(part)
+                os.remove(state_path)
+                return 1
+            os.replace(part, filename)
+            os.remove(state_path)
+            return 0
+        self.console.log(f"Error: could not download package '{pkg_name}' after {download_attempts} attempts. Run the command again to resume from {part}", mtype="error")
+        return 1
+
+    def __download_segmented(self, url, part, filename, pkg_name, head, expected):
+        connections = self.config.obj.get("download", {}).get("connections", 4)
+        state_path = Path(f"{part}.json")
+        if(connections < 2 or (os.path.exists(part) and "segments" not in Config(state_path).obj)):
+            return None
+        total = 0
+        if(head is not None and head.headers.get("Accept-Ranges", "none") == "bytes"):
+            total = int(head.headers.get("Content-Length", 0))
+        if(total < 2 * download_segment_size):
+            for path in [part, state_path]:
+                if(os.path.exists(path)):
+                    os.remove(path)
+            return None
+        state = Config(state_path)
+        validator = self.__range_validator(head)
+        if(state.obj.get("total") != total or validator == "" or state.obj.get("validator") != validator or not os.path.exists(part)):
+            count = min(connections, total // download_segment_size)
+            bounds = [total * i // count for i in range(count + 1)]
+            state.obj = {"total": total, "validator": validator, "segments": [[bounds[i], bounds[i + 1] - 1, 0] for i in range(count)]}
+            with open(part, "wb") as fd:
+                fd.truncate(total)
+                if(hasattr(os, "posix_fallocate")):
+                    try:
+                        os.posix_fallocate(fd.fileno(), 0, total)
+                    except OSError:
+                        pass
+            state.write()
         else:
-            res = requests.get(url, stream=True)
-            prev_blocks = 0
-            blocks_done = 0
-            blocks_todo = 50
-            chunks_total = int(res.headers['Content-Length']) / 128
-            chunks_done = 0
-            sys.stdout.write(f"    Downloading '{pkg_name}': [{'█' * blocks_done}{' ' * blocks_todo}] {blocks_done * 2}%")
-            with open(filename, 'wb') as fd:
-                for chunk in res.iter_content(chunk_size=128):
-                    chunks_done += 1
-                    blocks_done = int((chunks_done / chunks_total) * 50)
-                    blocks_todo = 50 - blocks_done
-                    if prev_blocks != blocks_done:
-                        prev_blocks = blocks_done
-                        sys.stdout.write(f"\rDownloading '{pkg_name}': [{'█' * blocks_done}{' ' * blocks_todo}] {blocks_done * 2}%\r")
+            self.console.log(f"Resuming download of '{pkg_name}' from {round(sum(segment[2] for segment in state.obj['segments']) / (1024 * 1024), 1)} MiB")
+        segments = [segment for segment in state.obj["segments"] if segment[0] + segment[2] <= segment[1]]
+        state_lock = threading.Lock()
+
+        def fetch(segment):
+            saved = [segment[2]]
+
+            def checkpoint(fd):
+                # Only count bytes that reached the file, so a crash never resumes past a hole
+                fd.flush()
+                segment[2] = fd.tell() - segment[0]
+                if(segment[2] - saved[0] >= download_checkpoint_size):
+                    with state_lock:
+                        self.__write_atomic(state)
+                    saved[0] = segment[2]
+
+            for attempt in range(download_attempts):
+                headers = {"Accept-Encoding": "identity", "Range": f"bytes={segment[0] + segment[2]}-{segment[1]}"}
+                if(validator != ""):
+                    headers["If-Range"] = validator
+                try:
+                    with requests.get(url, headers=headers, stream=True, timeout=60) as res:
+                        if(res.status_code != 206 or self.__range_start(res) != segment[0] + segment[2]):
+                            return None
+                        with open(part, "r+b") as fd:
+                            fd.seek(segment[0] + segment[2])
+                            try:
+                                self.__stream_to(res.raw, fd, progress, on_write=checkpoint)
+                            finally:
+                                segment[2] = fd.tell() - segment[0]
+                except (OSError, requests.exceptions.RequestException, urllib3.exceptions.HTTPError):
+                    time.sleep(attempt)
+                    continue
+                if(segment[0] + segment[2] > segment[1]):
+                    return True
+            return False
+
+        progress = DownloadProgress(self.termtype, self.__fmt_style(pkg_name, 'bold orchid1'), total)
+        progress.done = total - sum(segment[1] - segment[0] - segment[2] + 1 for segment in segments)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(segments) or 1) as pool:
+                results = list(pool.map(fetch, segments))
+        finally:
+            progress.close()
+            self.__write_atomic(state)
+        if(None in results):
+            self.console.log("Remote did not serve the requested byte ranges, downloading as a single stream", mtype="warning")
+            os.remove(part)
+            os.remove(state_path)
+            return None
+        if(not all(results)):
+            self.console.log(f"Error: could not download package '{pkg_name}' after {download_attempts} attempts. Run the command again to resume from {part}", mtype="error")
+            return 1
+        if(expected != "" and self.__sha256(part) != expected):
+            self.console.log(f"Error: download of '{pkg_name}' did not match the sha256 digest advertised by the remote", mtype="error")
+            os.remove(part)
+            os.remove(state_path)
+            return 1
+        os.replace(part, filename)
+        os.remove(state_path)
+        return 0
+
+    def __range_validator(self, res):
+        etag = res.headers.get("ETag", "")
+        if(etag != "" and not etag.startswith("W/")):
+            return etag
+        return res.headers.get("Last-Modified", "")
+
+    def __range_start(self, res):
+        match = re.match(r"bytes (\d+)-", res.headers.get("Content-Range", ""))
+        if(match is None):
+            return -1
+        return int(match.group(1))
+
+    def __stream_to(self, raw, fd, progress, digest=None, on_write=None):
+        raw.decode_content = True
+        buffer = bytearray(download_buffer_size)
+        view = memoryview(buffer)
+        while True:
+            size = raw.readinto(buffer)
+            if(not size):
+                break
+            fd.write(view[:size])
+            if(digest is not None):
+                digest.update(view[:size])
+            if(on_write is not None):
+                on_write(fd)
+            progress.advance(size)
+
+    def __parse_flags(self, args, value_flags=[]):
+        remaining = []
+        flags = {}
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if(arg.startswith("--")):
+                if("=" in arg):
+                    flags[arg.split("=")[0]] = arg.split("=", 1)[1]
+                elif(arg in value_flags and i + 1 < len(args)):
+                    flags[arg] = args[i + 1]
+                    i += 1
+                else:
+                    flags[arg] = True
+            else:
+                remaining.append(arg)
+            i += 1
+        return remaining, flags
 
     def __zip_recursive(self, path, zip_handle):
         for root, dirs, files in os.walk(path):
             for file in files:
                 zip_handle.write(os.path.join(root, file))
         
-    def __copy_local(self, path, dest, return_deps=False):
+    def __copy_local(self, path, dest, return_deps=False, manifest=None):
+        if(manifest is None):
+            manifest = Config(Path(f"{dest}/modi.manifest.json"))
+        manifest.obj.setdefault("files", {})
+        manifest.obj.setdefault("dists", {})
+        records, dists = self.__read_records(path)
+        seen = set()
         dest_files = os.listdir(dest)
         dependencies = []
         packages = []
@@ -1517,7 +2296,7 @@ class Modi:
         for fd in loop_var:
             pkg_type = "dependency"
             if "info" not in fd and "egg" not in fd and "pth" not in fd:
-                if(fd in self.packages):
+                if(fd in self.package_names):
                     pkg_type = "package"
                     packages.append(fd)
                 if("." in fd):
@@ -1527,66 +2306,416 @@ class Modi:
                     if(pkg_type == "dependency"):
                         dependencies.append(fd)
                     self.console.log(f"Installing {pkg_type} '{fd}'")
-                try:
-                    shutil.copytree(Path(f"{path}/{fd}"), f"{dest}/{fd}")
-                except NotADirectoryError:
-                    try:
-                        shutil.copy(Path(f"{path}/{fd}"), f"{dest}/{fd}")
-                    except FileExistsError:
-                        pass
-                    except shutil.SameFileError:
-                        pass
-                except FileExistsError:
-                    pass
+                self.__sync_entry(Path(f"{path}/{fd}"), dest, fd, manifest, records, seen)
             elif "egg" in fd and "info" not in fd and "pth" not in fd:
                 copy_list = []
                 if(not os.path.isdir(Path(f"{path}/{fd}"))):
-                    import zipfile
-                    egg_zip = zipfile.ZipFile(Path(f"{path}/{fd}"), "r")
-                    os.makedirs(Path(f"{path}/temp"), exist_ok=True)
-                    egg_zip.extractall(str(Path(f"{path}/temp")))
-                    egg_zip.close()
-                    os.remove(Path(f"{path}/{fd}"))
-                    shutil.copytree(Path(f"{path}/temp/{fd.split('-')[0]}"), Path(f"{path}/{fd.split('-')[0]}"))
-                    shutil.rmtree(Path(f"{path}/temp"))
-                    file = fd.split('-')[0]
-                    if(file not in dest_files):
-                        if(file in self.packages):
-                            pkg_type = "package"
-                        self.console.log(f"Installing {pkg_type} '{file}'")
-                    try:
-                        shutil.copytree(Path(f"{path}/{file}"), f"{dest}/{file}")
-                    except NotADirectoryError:
-                        try:
-                            shutil.copy(Path(f"{path}/{file}"), f"{dest}/{file}")
-                        except FileExistsError:
-                            pass
-                    except FileExistsError:
-                        pass
-                    break
+                    self.__extract_egg(Path(f"{path}/{fd}"), dest, dest_files, manifest, seen, dist=fd.split('-')[0])
+                    continue
 
-                    
                 for file in os.listdir(Path(f"{path}/{fd}")):
                     if file != "EGG-INFO":
                         copy_list.append(file)
                 for file in copy_list:
                     if(file not in dest_files):
-                        if(file in self.packages):
+                        if(file in self.package_names):
                             pkg_type = "package"
                         self.console.log(f"Installing {pkg_type} '{file}'")
-                    try:
-                        shutil.copytree(Path(f"{path}/{fd}/{file}"), f"{dest}/{file}")
-                    except NotADirectoryError:
-                        try:
-                            shutil.copy(Path(f"{path}/{fd}/{file}"), f"{dest}/{file}")
-                        except FileExistsError:
-                            pass
-                    except FileExistsError:
-                        pass
+                    self.__sync_entry(Path(f"{path}/{fd}/{file}"), dest, file, manifest, records, seen, dist=fd.split('-')[0])
             else:
                 pass
+        for rel, entry in list(manifest.obj["files"].items()):
+            if(entry["dist"] in dists and rel not in seen):
+                try:
+                    os.remove(Path(f"{dest}/{rel}"))
+                except OSError:
+                    pass
+                del manifest.obj["files"][rel]
+        for name, dist in dists.items():
+            requested = manifest.obj["dists"].get(name, {}).get("requested", False)
+            manifest.obj["dists"][name] = {key: value for key, value in dist.items() if key != "files"}
+            manifest.obj["dists"][name]["requested"] = requested
         if(return_deps):
             return dependencies, packages
+
+    def __extract_egg(self, egg_path, dest, dest_files, manifest, seen, dist):
+        import zipfile
+        with zipfile.ZipFile(egg_path, "r") as egg_zip:
+            members = []
+            for member in egg_zip.infolist():
+                rel = Path(os.path.normpath(member.filename)).as_posix()
+                if(member.is_dir() or rel.startswith("EGG-INFO/") or rel.startswith("..") or os.path.isabs(rel)):
+                    continue
+                members.append((member, rel))
+            for name in sorted(set(rel.split("/")[0] for member, rel in members)):
+                if(name not in dest_files):
+                    pkg_type = "dependency"
+                    if(name in self.package_names):
+                        pkg_type = "package"
+                    self.console.log(f"Installing {pkg_type} '{name}'")
+            for member, rel in members:
+                target = Path(f"{dest}/{rel}")
+                entry = manifest.obj["files"].get(rel)
+                if(entry is not None and self.__stat_matches(target, entry)):
+                    with egg_zip.open(member) as member_file:
+                        reader = HashingReader(member_file)
+                        reader.drain()
+                    if(reader.hexdigest() == entry["sha256"]):
+                        seen.add(rel)
+                        continue
+                if(os.path.isdir(target) and not os.path.islink(target)):
+                    continue
+                os.makedirs(target.parent, exist_ok=True)
+                if(os.path.lexists(target)):
+                    os.remove(target)
+                with egg_zip.open(member) as member_file:
+                    reader = HashingReader(member_file)
+                    with open(target, "wb") as out_file:
+                        shutil.copyfileobj(reader, out_file, 1024 * 1024)
+                self.__record_file(dest, rel, manifest, {}, seen, dist, digest=reader.hexdigest())
+
+    def __sync_entry(self, src, dest, name, manifest, records, seen, dist=""):
+        target = Path(f"{dest}/{name}")
+        if(dist == ""):
+            dist = self.__normalise_name(name.split(".")[0])
+        src_is_dir = os.path.isdir(src) and not os.path.islink(src)
+        if(not os.path.lexists(target)):
+            self.__materialise(src, target)
+            if(src_is_dir):
+                for root, dirs, files in os.walk(target):
+                    for file in [*files, *[d for d in dirs if os.path.islink(Path(f"{root}/{d}"))]]:
+                        rel = Path(os.path.relpath(Path(f"{root}/{file}"), dest)).as_posix()
+                        self.__record_file(dest, rel, manifest, records, seen, dist)
+            else:
+                self.__record_file(dest, name, manifest, records, seen, dist)
+            return
+        if(src_is_dir != os.path.isdir(target)):
+            return
+        if(not src_is_dir):
+            self.__sync_file(src, dest, name, manifest, records, seen, dist)
+            return
+        for root, dirs, files in os.walk(src):
+            rel_root = os.path.relpath(root, src)
+            os.makedirs(Path(f"{target}/{rel_root}"), exist_ok=True)
+            for file in [*files, *[d for d in dirs if os.path.islink(Path(f"{root}/{d}"))]]:
+                rel = Path(os.path.normpath(f"{name}/{rel_root}/{file}")).as_posix()
+                self.__sync_file(Path(f"{root}/{file}"), dest, rel, manifest, records, seen, dist)
+
+    def __sync_file(self, src, dest, rel, manifest, records, seen, dist):
+        target = Path(f"{dest}/{rel}")
+        digest = records.get(rel, {}).get("sha256", "")
+        if(digest == "" and not os.path.islink(src)):
+            digest = self.__sha256(src)
+        entry = manifest.obj["files"].get(rel)
+        if(entry is not None and entry["sha256"] == digest and self.__stat_matches(target, entry)):
+            seen.add(rel)
+            return
+        self.__materialise(src, target)
+        self.__record_file(dest, rel, manifest, records, seen, dist, digest=digest)
+
+    def __record_file(self, dest, rel, manifest, records, seen, dist, digest=""):
+        path = Path(f"{dest}/{rel}")
+        if(digest == ""):
+            digest = records.get(rel, {}).get("sha256", "")
+        if(digest == "" and not os.path.islink(path)):
+            digest = self.__sha256(path)
+        stat = os.lstat(path)
+        manifest.obj["files"][rel] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest, "dist": records.get(rel, {}).get("dist", dist)}
+        seen.add(rel)
+
+    def __stat_matches(self, path, entry):
+        try:
+            stat = os.lstat(path)
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime"]
+
+    def __file_matches(self, path, entry):
+        if(self.__stat_matches(path, entry)):
+            return True
+        try:
+            if(os.path.islink(path) or os.path.getsize(path) != entry["size"]):
+                return False
+        except OSError:
+            return False
+        return self.__sha256(path) == entry["sha256"]
+
+    def __manifest_current(self, manifest, packages):
+        if(not set(packages).issubset(set(manifest.obj.get("requested", [])))):
+            return False
+        for rel, entry in manifest.obj.get("files", {}).items():
+            if(not self.__stat_matches(Path(f"{self.prefix}/{rel}"), entry)):
+                return False
+        for entry in manifest.obj.get("links", {}).values():
+            if(not os.path.isdir(entry["path"])):
+                return False
+        return True
+
+    def __intact_dists(self, manifest):
+        intact = set(manifest.obj.get("dists", {}).keys())
+        for rel, entry in manifest.obj.get("files", {}).items():
+            if(entry["dist"] in intact and not self.__file_matches(Path(f"{self.prefix}/{rel}"), entry)):
+                intact.discard(entry["dist"])
+        return intact
+
+    def __read_records(self, site_dir, skip=set()):
+        records = {}
+        dists = {}
+        for entry in os.listdir(site_dir):
+            if(not entry.endswith(".dist-info") or entry in skip):
+                continue
+            name, version = entry[:-len(".dist-info")].split("-", 1)
+            name = self.__normalise_name(name)
+            dists[name] = {"version": version, "dist_info": entry, "requires": self.__read_requires(Path(f"{site_dir}/{entry}/METADATA")), "files": [], "requested": False}
+            try:
+                with open(Path(f"{site_dir}/{entry}/RECORD"), "r", newline="") as record:
+                    for row in csv.reader(record):
+                        if(len(row) < 2):
+                            continue
+                        digest = ""
+                        if(row[1].startswith("sha256=")):
+                            encoded = row[1][len("sha256="):]
+                            digest = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)).hex()
+                        records[Path(os.path.normpath(row[0])).as_posix()] = {"dist": name, "sha256": digest}
+                        dists[name]["files"].append(Path(os.path.normpath(row[0])).as_posix())
+            except FileNotFoundError:
+                pass
+        return records, dists
+
+    def __read_requires(self, metadata_path):
+        requires = []
+        try:
+            with open(metadata_path, "r", encoding="utf-8", errors="replace") as metadata:
+                for line in metadata:
+                    if(line.strip() == ""):
+                        break
+                    if(not line.startswith("Requires-Dist:")):
+                        continue
+                    requirement = line[len("Requires-Dist:"):].strip()
+                    if(";" in requirement and "extra" in requirement.split(";", 1)[1]):
+                        continue
+                    if(Requirement is not None):
+                        try:
+                            marker = Requirement(requirement).marker
+                            if(marker is not None and not marker.evaluate()):
+                                continue
+                        except InvalidRequirement:
+                            pass
+                    match = re.match(r"[A-Za-z0-9][A-Za-z0-9._-]*", requirement)
+                    if(match):
+                        requires.append(self.__normalise_name(match.group(0)))
+        except FileNotFoundError:
+            pass
+        return requires
+
+    def __forget_dist(self, index, name, local):
+        dist = index.obj["dists"].pop(name)
+        if(local):
+            owned = [rel for rel, entry in index.obj["files"].items() if entry["dist"] == name]
+            for rel in owned:
+                del index.obj["files"][rel]
+            return set(owned)
+        if(dist.get("dist_info") in index.obj.get("scanned", [])):
+            index.obj["scanned"].remove(dist["dist_info"])
+        return set([*dist.get("files", []), dist.get("dist_info", "")]) - set([""])
+
+    def __delete_paths(self, root, paths):
+        def delete(rel):
+            path = Path(f"{root}/{rel}")
+            try:
+                if(os.path.isdir(path) and not os.path.islink(path)):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        paths = [rel for rel in paths if not rel.startswith("..")]
+        if(len(paths) > 64):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+                list(pool.map(delete, paths))
+        else:
+            for rel in paths:
+                delete(rel)
+        parents = set()
+        for rel in paths:
+            parent = os.path.dirname(rel)
+            while parent != "":
+                parents.add(parent)
+                parent = os.path.dirname(parent)
+        for parent in sorted(parents, key=lambda rel: rel.count("/"), reverse=True):
+            try:
+                os.rmdir(Path(f"{root}/{parent}"))
+            except OSError:
+                pass
+
+    def __requirement_name(self, requirement):
+        match = re.match(r"\s*@?\s*([A-Za-z0-9][A-Za-z0-9._-]*)", requirement)
+        if(match is None):
+            return self.__normalise_name(requirement)
+        return self.__normalise_name(match.group(1))
+
+    def __links_dir(self):
+        return Path(f"{self.config.obj['cache']['path']}/links")
+
+    def __link_candidates(self, manifest):
+        candidates = {}
+        links = self.__links_dir()
+        if(os.path.isdir(links)):
+            for entry in os.listdir(links):
+                if(not entry.endswith(f"-{self.__python_tag()}")):
+                    continue
+                path = Path(f"{links}/{entry}")
+                for dist_info in [name for name in os.listdir(path) if name.endswith(".dist-info")]:
+                    name, version = dist_info[:-len(".dist-info")].split("-", 1)
+                    name = self.__normalise_name(name)
+                    if(name in candidates and self.__version_key(candidates[name]["version"]) >= self.__version_key(version)):
+                        continue
+                    candidates[name] = {"version": version, "requires": self.__read_requires(Path(f"{path}/{dist_info}/METADATA")), "path": str(path)}
+        for name, entry in manifest.obj.get("links", {}).items():
+            if(os.path.isdir(entry["path"])):
+                candidates[name] = {key: value for key, value in entry.items() if key != "requested"}
+        return candidates
+
+    def __link_dists(self, site_dir):
+        records, dists = self.__read_records(site_dir)
+        links = self.__links_dir()
+        os.makedirs(links, exist_ok=True)
+        linked = {}
+        created = []
+        for name, dist in dists.items():
+            path = Path(f"{links}/{name}-{dist['version']}-{self.__python_tag()}")
+            files = [rel for rel in dist["files"] if not rel.startswith("..")]
+            if(not os.path.isdir(path)):
+                stage = tempfile.mkdtemp(prefix=".modi-link-", dir=links)
+                for rel in files:
+                    if(os.path.lexists(Path(f"{site_dir}/{rel}"))):
+                        os.makedirs(Path(f"{stage}/{os.path.dirname(rel)}"), exist_ok=True)
+                        self.__materialise(Path(f"{site_dir}/{rel}"), Path(f"{stage}/{rel}"))
+                try:
+                    os.rename(stage, path)
+                    created.append(path)
+                except OSError:
+                    shutil.rmtree(stage, ignore_errors=True)
+            self.__delete_paths(site_dir, files)
+            linked[name] = {"version": dist["version"], "requires": dist["requires"], "path": str(path)}
+            self.console.log(f"Linked package '{name}' {dist['version']} from the Modi cache")
+        return linked, created
+
+    def __write_links(self, manifest, candidates):
+        wanted = set(name for name, entry in manifest.obj.get("links", {}).items() if entry.get("requested", False))
+        wanted.update(self.__requirement_name(req) for req in manifest.obj.get("requested", []))
+        links = {}
+        queue = [*wanted]
+        while len(queue) > 0:
+            name = queue.pop()
+            if(name in links or name not in candidates):
+                continue
+            links[name] = {**candidates[name], "requested": name in wanted}
+            queue.extend(candidates[name].get("requires", []))
+        manifest.obj["links"] = links
+        with open(Path(f"{self.prefix}/modi_links.pth"), "w") as pth:
+            for name in sorted(links):
+                pth.write(links[name]["path"] + "\n")
+        with open(Path(f"{self.prefix}/modi_links.py"), "w") as stub:
+            stub.write(link_stub)
+
+    def __satisfied(self, packages, dists):
+        return [pkg for pkg in packages if self.__requirement_met(pkg.lstrip("@"), dists, set())]
+
+    def __requirement_met(self, requirement, dists, seen):
+        # Only the versions of requested packages are checked, their dependencies just have to be present
+        name = self.__requirement_name(requirement)
+        if(name in seen):
+            return True
+        seen.add(name)
+        if(Requirement is not None):
+            try:
+                req = Requirement(requirement)
+            except InvalidRequirement:
+                return False
+            if(req.marker is not None and not req.marker.evaluate()):
+                return True
+            if(name not in dists or req.url or req.extras):
+                return False
+            try:
+                if(not req.specifier.contains(dists[name]["version"], prereleases=True)):
+                    return False
+            except Exception:
+                return False
+        elif(name not in dists or re.search(r"[<>=!~;@\[]", requirement)):
+            return False
+        return all(self.__requirement_met(dep, dists, seen) for dep in dists[name].get("requires", []))
+
+    def __index_new_dists(self):
+        site_dir = Path(f"{self.prefix}{self.site_prefix}")
+        self.dist_index.setdefault("dists", {})
+        self.dist_index.setdefault("scanned", [])
+        if(not os.path.isdir(site_dir)):
+            return []
+        records, dists = self.__read_records(site_dir, skip=set(self.dist_index["scanned"]))
+        for name, dist in dists.items():
+            self.dist_index["dists"][name] = dist
+            self.dist_index["scanned"].append(dist["dist_info"])
+        return list(dists.keys())
+
+    def __count_new_deps(self):
+        return len([name for name in self.__index_new_dists() if name not in self.requested_names])
+
+    def __normalise_name(self, name):
+        return re.sub(r"[-_.]+", "-", name).lower()
+
+    def __materialise(self, src, dst, move=True):
+        # rename (when src may be consumed) > hardlink > reflink > byte copy
+        # existing directories at dst are left alone, like copytree used to
+        if(os.path.lexists(dst) and (os.path.isdir(dst) or (os.path.isdir(src) and not os.path.islink(src)))):
+            return
+        if(move):
+            try:
+                os.replace(src, dst)
+                return
+            except OSError:
+                pass
+        if(os.path.isdir(src) and not os.path.islink(src)):
+            for root, dirs, files in os.walk(src):
+                rel = os.path.relpath(root, src)
+                os.makedirs(Path(f"{dst}/{rel}"), exist_ok=True)
+                for file in [*files, *[d for d in dirs if os.path.islink(Path(f"{root}/{d}"))]]:
+                    self.__place_file(Path(f"{root}/{file}"), Path(f"{dst}/{rel}/{file}"))
+            if(move):
+                shutil.rmtree(src, ignore_errors=True)
+        else:
+            self.__place_file(src, dst)
+            if(move):
+                os.remove(src)
+
+    def __place_file(self, src, dst):
+        if(os.path.lexists(dst)):
+            os.remove(dst)
+        if(os.path.islink(src)):
+            os.symlink(os.readlink(src), dst)
+            return
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+        try:
+            self.__reflink(src, dst)
+            return
+        except OSError:
+            if(os.path.lexists(dst)):
+                os.remove(dst)
+        shutil.copy2(src, dst)
+
+    def __reflink(self, src, dst):
+        if(sys.platform != "linux"):
+            raise OSError("reflinks are only supported on Linux")
+        import fcntl
+        FICLONE = 0x40049409
+        with open(src, "rb") as src_file:
+            with open(dst, "wb") as dst_file:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        shutil.copystat(src, dst)
     
     def __fmt_style(self, text, style):
         if(self.termtype == "rich"):
@@ -1626,68 +2755,657 @@ class Modi:
 
 
 
-    def __install_pip(self, pkg):
+    def __install_pip(self, pkg, quiet=False, prefix=None):
+        if(prefix is None):
+            prefix = self.prefix
+        pkgs = pkg
+        if(isinstance(pkg, str)):
+            pkgs = [pkg]
         current_env = os.environ.copy()
-        current_env["PYTHONPATH"] = str(Path(self.prefix) / Path(self.site_prefix))
+        current_env["PYTHONPATH"] = str(Path(prefix) / Path(self.site_prefix))
+        pip_args = [sys.executable, "-m", "pip", "install", "--quiet", "--ignore-installed", "--no-warn-script-location"]
         if(os.name != "posix"):
-            inst_result = subprocess.run(f"'{sys.executable}' -m pip install --disable-pip-version-check --quiet --ignore-installed --no-warn-script-location {pkg} --prefix \"{self.prefix}\"", env=current_env, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-        else:
-            inst_result = subprocess.run(f"'{sys.executable}' -m pip install --quiet --ignore-installed --no-warn-script-location {pkg} --prefix {self.prefix}", env=current_env, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+            pip_args.append("--disable-pip-version-check")
+        inst_result = None
+        if(self.config.obj["cache"].get("store", True)):
+            inst_result = self.__install_from_store(pip_args, pkgs, prefix, current_env)
+        if(inst_result is None or inst_result.returncode != 0):
+            inst_result = self.__run_pip([*pip_args, *self.__pip_index_args(), *pkgs, "--prefix", str(prefix)], " ".join(pkgs), env=current_env)
         if(inst_result.returncode != 0):
-            self.console.log(f"Installing package {pkg} failed, adding to setuptools queue", mtype="warning")
+            if(not quiet):
+                self.console.log(f"Installing package {pkg} failed, adding to setuptools queue", mtype="warning")
             return 1
         else:
 
             return 0
+
+    def __install_from_store(self, pip_args, pkgs, prefix, env):
+        store = self.__store_dir()
+        os.makedirs(Path(f"{store}/wheels"), exist_ok=True)
+        # Only exact pins already in the store can skip the index, anything else would stick to whichever version was cached first
+        if(self.__store_pinned(pkgs)):
+            offline_args = [*pip_args, "--no-index", "--find-links", str(Path(f"{store}/wheels")), *pkgs, "--prefix", str(prefix)]
+            if(self.wheelhouse != "" and "--find-links" in self.__pip_index_args()):
+                offline_args[-2:-2] = ["--find-links", str(self.__wheelhouse_path())]
+            inst_result = self.__run_pip(offline_args, " ".join(pkgs), env=env)
+            if(inst_result.returncode == 0):
+                return inst_result
+        wheel_dir = tempfile.mkdtemp(prefix=".modi-wheels-", dir=store)
+        try:
+            wheel_args = [sys.executable, "-m", "pip", "wheel", "--quiet", "--wheel-dir", wheel_dir, "--find-links", str(Path(f"{store}/wheels")), *self.__pip_index_args(), *pkgs]
+            wheel_result = self.__run_pip(wheel_args, " ".join(pkgs))
+            if(wheel_result.returncode != 0):
+                return wheel_result
+            # Install exactly the set pip just resolved against the index before it is moved into the store
+            inst_result = self.__run_pip([*pip_args, "--no-index", "--find-links", wheel_dir, *pkgs, "--prefix", str(prefix)], " ".join(pkgs), env=env)
+            phase_start = time.perf_counter()
+            self.__store_ingest(wheel_dir)
+            self.__trace("copy", phase_start, " ".join(pkgs), name="ingest wheels into store")
+        finally:
+            shutil.rmtree(wheel_dir, ignore_errors=True)
+        return inst_result
+
+    def __store_pinned(self, pkgs):
+        store_index = Path(f"{self.__store_dir()}/index.json")
+        if(not os.path.exists(store_index)):
+            return False
+        keys = Config(store_index).obj.keys()
+        for pkg in pkgs:
+            match = re.match(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*===?\s*([^\s,;*]+)\s*$", pkg)
+            if(match is None):
+                return False
+            name, version = self.__normalise_name(match.group(1)), match.group(3)
+            if(not any(key.startswith(f"{name}/{version}/") for key in keys)):
+                return False
+        return True
+
+    def __run_pip(self, pip_args, pkg, env=None):
+        if(self.tracer is None):
+            return subprocess.run(pip_args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        pip_args = [arg for arg in pip_args if arg != "--quiet"]
+        if(pip_args[3] in ["install", "wheel"]):
+            pip_args[4:4] = ["--progress-bar", "off"]
+        phase, phase_start = "resolve", time.perf_counter()
+        with subprocess.Popen(pip_args, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace") as proc:
+            for line in proc.stdout:
+                for next_phase, pattern in pip_phase_patterns:
+                    if(next_phase != phase and pattern.match(line)):
+                        now = time.perf_counter()
+                        self.tracer.add(phase, phase_start, now, pkg, name=f"pip {phase}")
+                        phase, phase_start = next_phase, now
+                        break
+        self.tracer.add(phase, phase_start, time.perf_counter(), pkg, name=f"pip {phase}")
+        return subprocess.CompletedProcess(pip_args, proc.returncode)
+
+    def __precompile(self, paths, ddir=None):
+        paths = [str(path) for path in paths if os.path.exists(path)]
+        if(len(paths) == 0):
+            return 0
+        start = time.perf_counter()
+        # -f because .pyc files written by pip still carry the staging path they were compiled at
+        compile_args = [sys.executable, "-m", "compileall", "-q", "-f", "-j", "0"]
+        if(ddir is not None):
+            compile_args.extend(["-d", str(ddir)])
+        res = subprocess.run([*compile_args, *paths], stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        self.__trace("build", start, name="precompile bytecode")
+        if(res.returncode != 0):
+            self.console.log("Some modules could not be byte-compiled, they will be compiled on first import instead", mtype="warning")
+        self.console.log(f"Precompiled bytecode in {round(time.perf_counter() - start, 1)} seconds", mtype="message")
+        return res.returncode
+
+    def __trace(self, phase, start, pkg="", name=""):
+        if(self.tracer is not None):
+            self.tracer.add(phase, start, time.perf_counter(), pkg, name)
+
+    def __traced(self, args, trace_path, shell):
+        self.tracer = Tracer()
+        start = time.perf_counter()
+        try:
+            return self.parseargs(args, shell=shell)
+        finally:
+            self.tracer.add("command", start, time.perf_counter(), name=" ".join(args))
+            self.tracer.write(Path(trace_path))
+            header = "package".ljust(24) + "".join(phase.rjust(10) for phase in trace_phases)
+            self.console.log(f"Phase timings in seconds, trace written to {trace_path}", mtype="info")
+            self.console.log(header, mtype="info")
+            for pkg, row in self.tracer.summary():
+                self.console.log(pkg[:23].ljust(24) + "".join(f"{row[phase]:10.2f}" for phase in trace_phases), mtype="info")
+            self.tracer = None
+
+    def __wheelhouse_path(self):
+        if(self.wheelhouse.startswith("file:")):
+            import urllib.parse
+            return Path(urllib.request.url2pathname(urllib.parse.urlparse(self.wheelhouse).path))
+        return Path(os.path.abspath(os.path.expanduser(self.wheelhouse)))
+
+    def __pip_index_args(self):
+        if(self.wheelhouse == ""):
+            return []
+        wheelhouse = self.__wheelhouse_path()
+        if(os.path.exists(Path(f"{wheelhouse}/index.html"))):
+            return ["--index-url", wheelhouse.as_uri()]
+        return ["--no-index", "--find-links", str(wheelhouse)]
+
+    def __find_wheelhouse_sdist(self, pkg, requirement=""):
+        wheelhouse = self.__wheelhouse_path()
+        candidates = []
+        for folder in [wheelhouse, Path(f"{wheelhouse}/{self.__normalise_name(pkg)}")]:
+            if(not os.path.isdir(folder)):
+                continue
+            for file in os.listdir(folder):
+                match = re.match(r"^(.+?)-(\d[^-]*)\.tar\.gz$", file)
+                if(match and self.__normalise_name(match.group(1)) == self.__normalise_name(pkg) and self.__version_allowed(requirement, match.group(2))):
+                    candidates.append((self.__version_key(match.group(2)), match.group(2), Path(f"{folder}/{file}")))
+        if(len(candidates) == 0):
+            return None, None
+        candidates.sort()
+        return candidates[-1][2], candidates[-1][1]
+
+    def __version_allowed(self, requirement, version):
+        spec = requirement.split(";", 1)[0]
+        if(re.search(r"[<>=!~]", spec) is None):
+            return True
+        if(Requirement is None):
+            # Without packaging only exact pins can be checked
+            match = re.search(r"===?\s*([^\s,]+)\s*$", spec)
+            return match is not None and match.group(1) == version
+        try:
+            return Requirement(spec.lstrip("@").strip()).specifier.contains(version, prereleases=True)
+        except Exception:
+            return False
+
+    def __version_key(self, version):
+        return [(0, int(part), "") if part.isdigit() else (-1, 0, part) for part in re.findall(r"\d+|[a-z]+", version.lower())]
+
+    def __store_dir(self):
+        return Path(f"{self.config.obj['cache']['path']}/store")
+
+    def __store_ingest(self, wheel_dir):
+        store = self.__store_dir()
+        with self.store_lock:
+            index = Config(Path(f"{store}/index.json"))
+            for file in os.listdir(wheel_dir):
+                if(not file.endswith(".whl")):
+                    continue
+                digest = self.__sha256(Path(f"{wheel_dir}/{file}"))
+                blob = Path(f"{store}/objects/{digest[:2]}/{digest}")
+                if(not os.path.exists(blob)):
+                    os.makedirs(blob.parent, exist_ok=True)
+                    os.replace(Path(f"{wheel_dir}/{file}"), blob)
+                link = Path(f"{store}/wheels/{file}")
+                if(not os.path.lexists(link)):
+                    try:
+                        os.link(blob, link)
+                    except OSError:
+                        shutil.copy(blob, link)
+                name, version, tag = self.__wheel_key(file)
+                index.obj[f"{name}/{version}/{tag}"] = {"file": file, "sha256": digest}
+            index.write()
+
+    def __wheel_key(self, filename):
+        parts = filename[:-len(".whl")].split("-")
+        return self.__normalise_name(parts[0]), parts[1], "-".join(parts[-3:])
+
+    def __sha256(self, path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def __journal_start(self, local, restart):
+        self.journal = Config(Path(f"{self.prefix}/modi.journal.json"))
+        # Only clear stages this journal created, the prefix may be a cache shared with other installs
+        for stage in self.journal.obj.get("stages", []):
+            shutil.rmtree(Path(f"{self.prefix}/{stage}"), ignore_errors=True)
+        if(not restart and self.journal.obj.get("packages") == self.packages):
+            done = self.journal.obj.get("done", [])
+            if(len(done) > 0):
+                self.console.log(f"Resuming interrupted install, {len(done)} of {len(self.packages)} packages already done. Use {self.__fmt_code('--restart')} to start over.", mtype="warning")
+            self.journal.obj["stages"] = []
+            self.__journal_write()
+            return done
+        if(restart and "packages" in self.journal.obj):
+            self.console.log("Discarding journal of interrupted install", mtype="warning")
+        for staged in self.journal.obj.get("staged", []):
+            shutil.rmtree(Path(f"{self.prefix}/{staged}"), ignore_errors=True)
+        staged = []
+        if(local):
+            staged = ["lib", "bin", "scripts"]
+        self.journal.obj = {"packages": [*self.packages], "done": [], "staged": staged, "stages": []}
+        self.__journal_write()
+        return []
+
+    def __journal_done(self, *pkgs):
+        with self.journal_lock:
+            self.journal.obj["done"].extend(pkgs)
+        self.__journal_write()
+
+    def __journal_stage(self, stage):
+        with self.journal_lock:
+            self.journal.obj.setdefault("stages", []).append(os.path.basename(stage))
+        self.__journal_write()
+
+    def __journal_write(self):
+        with self.journal_lock:
+            self.__write_atomic(self.journal)
+
+    def __write_atomic(self, config):
+        # Write to a temporary file and swap it in, so an interrupted write never leaves truncated JSON behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(config.config_file)), suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(json.dumps(config.obj, indent=4, sort_keys=True))
+        os.replace(tmp_path, config.config_file)
+
+    def __journal_finish(self):
+        try:
+            os.remove(Path(f"{self.prefix}/modi.journal.json"))
+        except FileNotFoundError:
+            pass
+
+    def __install_lock(self, local, lock_obj, manifest):
+        entries = lock_obj["packages"]
+        if(local and manifest is not None):
+            installed = manifest.obj.get("dists", {})
+            intact = self.__intact_dists(manifest)
+            entries = [pkg for pkg in entries if pkg["name"] not in intact or installed[pkg["name"]].get("version") != pkg["version"]]
+        if(len(entries) == 0):
+            self.console.log("All locked packages are already installed", mtype="message")
+            return []
+        verb = "Installing"
+        if(local):
+            verb = "Downloading"
+        self.console.log(f"{verb} {len(entries)} locked packages from modi.lock", mtype="message")
+        if(lock_obj.get("python") != self.__python_tag()):
+            self.console.log(f"modi.lock was created for {lock_obj.get('python')}, not {self.__python_tag()}", mtype="warning")
+        store_files = {}
+        store_index = Path(f"{self.__store_dir()}/index.json")
+        if(os.path.exists(store_index)):
+            with open(store_index, "r") as index_file:
+                for entry in json.loads(index_file.read()).values():
+                    store_files[entry["sha256"]] = Path(f"{self.__store_dir()}/wheels/{entry['file']}")
+        hashed = all(pkg["sha256"] != "" for pkg in entries)
+        req_dir = tempfile.mkdtemp(prefix=".modi-lock-")
+        req_path = Path(f"{req_dir}/requirements.txt")
+        with open(req_path, "w") as req_file:
+            for pkg in entries:
+                source = pkg["url"]
+                if(pkg["sha256"] in store_files and os.path.exists(store_files[pkg["sha256"]])):
+                    source = store_files[pkg["sha256"]].as_uri()
+                elif(self.wheelhouse != ""):
+                    source = f"{pkg['name']}=={pkg['version']}"
+                if(hashed):
+                    req_file.write(f"{source} --hash=sha256:{pkg['sha256']}\n")
+                else:
+                    req_file.write(f"{source}\n")
+        current_env = os.environ.copy()
+        current_env["PYTHONPATH"] = str(Path(self.prefix) / Path(self.site_prefix))
+        pip_args = [sys.executable, "-m", "pip", "install", "--quiet", "--ignore-installed", "--no-warn-script-location", "--no-deps", *self.__pip_index_args(), "-r", str(req_path), "--prefix", str(self.prefix)]
+        if(hashed):
+            pip_args.append("--require-hashes")
+        inst_result = self.__run_pip(pip_args, "modi.lock", env=current_env)
+        shutil.rmtree(req_dir, ignore_errors=True)
+        if(inst_result.returncode != 0):
+            self.console.log("Installing from modi.lock failed, resolving requirements instead", mtype="warning")
+            return self.packages
+        requested = [pkg for pkg in entries if pkg["requested"]]
+        self.__index_new_dists()
+        self.total_deps += len(entries) - len(requested)
+        for pkg in requested:
+            if(local):
+                self.console.log(f"Downloaded package '{pkg['name']}' ({pkg['version']})", mtype="completion")
+            else:
+                self.console.log(f"Installed package '{pkg['name']}' ({pkg['version']})", mtype="completion")
+        return []
+
+    def __read_lock(self, path):
+        try:
+            with open(path, "r") as lock_file:
+                lock_obj = json.loads(lock_file.read())
+            lock_obj["requirements"]
+            lock_obj["packages"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self.console.log(f"Error: could not read lockfile '{path}'", mtype="error")
+            return None
+        return lock_obj
+
+    def __read_requirements(self, path):
+        requirements = []
+        with open(path, "r") as reqs:
+            for line in reqs.readlines():
+                line = line.strip()
+                if(line == ""):
+                    continue
+                if(line[0] != "-" and line[0] != "." and line[0] != "#"):
+                    requirements.append(line.split(" #")[0].strip())
+        return requirements
+
+    def __python_tag(self):
+        return f"{sys.implementation.name}{sys.version_info.major}{sys.version_info.minor}-{sysconfig.get_platform().replace('-', '_').replace('.', '_')}"
+
+    def __install_pip_batch(self, local, pkgs):
+        pip_pkgs = [pkg for pkg in pkgs if pkg[0] != "@"]
+        if(len(pip_pkgs) < 2):
+            return pkgs
+        verb = "Installing"
+        if(local):
+            verb = "Downloading"
+        self.console.log(f"{verb} {len(pip_pkgs)} packages with PIP in a single batch", mtype="message")
+        if(self.__install_pip(pip_pkgs, quiet=True) != 0):
+            self.console.log("Batched install failed, retrying packages one by one", mtype="warning")
+            return pkgs
+        self.total_deps += self.__count_new_deps()
+        self.__journal_done(*pip_pkgs)
+        for pkg in pip_pkgs:
+            if(local):
+                self.console.log(f"Downloaded package '{pkg}'", mtype="completion")
+            else:
+                self.console.log(f"Installed package '{pkg}'", mtype="completion")
+        return [pkg for pkg in pkgs if pkg[0] == "@"]
+
+    def __install_parallel(self, local, jobs, pkgs):
+        verb = "Installing"
+        if(local):
+            verb = "Downloading"
+        self.console.log(f"{verb} {len(pkgs)} packages with {jobs} workers", mtype="message")
+        pkgs_failed = 0
+        pkgs_done = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(self.__install_worker, pkg) for pkg in pkgs]
+            results = concurrent.futures.as_completed(futures)
+            if(self.termtype == "rich"):
+                results = rich.progress.track(results, description="    Downloading & Building...", total=len(futures), transient=True)
+            for future in results:
+                entry, pkg, mode, res, stage = future.result()
+                if(res == 0):
+                    self.__merge_prefix(stage, self.prefix)
+                if(res != 0):
+                    self.console.log(f"Error: failed to install package '{pkg}'", mtype="error")
+                    pkgs_failed += 1
+                else:
+                    pkgs_done += 1
+                    self.__journal_done(entry)
+                    if(local):
+                        self.console.log(f"Downloaded package '{pkg}' with {mode}", mtype="completion")
+                    else:
+                        self.console.log(f"Installed package '{pkg}' with {mode}", mtype="completion")
+                shutil.rmtree(stage, ignore_errors=True)
+        self.total_deps += self.__count_new_deps()
+        return [], pkgs_failed
+
+    def __install_worker(self, pkg):
+        entry = pkg
+        stage = tempfile.mkdtemp(prefix=".modi-stage-", dir=self.prefix)
+        self.__journal_stage(stage)
+        mode = "PIP"
+        res = 1
+        if(pkg[0] == "@"):
+            pkg = pkg[1:]
+        else:
+            res = self.__install_pip(pkg, quiet=True, prefix=stage)
+        if(res != 0):
+            mode = "SETUPTOOLS"
+            res = self.__install_setuptools(pkg, prefix=stage)
+            if(res == 0 and not self.__setuptools_installed(pkg, stage)):
+                res = 1
+        return entry, pkg, mode, res, stage
+
+    def __merge_prefix(self, src, dest):
+        # Behave like a serial 'pip install --ignore-installed --prefix': newer files win and older versions of the same dists go away
+        self.__drop_superseded(Path(f"{src}{self.site_prefix}"), Path(f"{dest}{self.site_prefix}"))
+        for root, dirs, files in os.walk(src):
+            rel = os.path.relpath(root, src)
+            os.makedirs(Path(f"{dest}/{rel}"), exist_ok=True)
+            for file in [*files, *[d for d in dirs if os.path.islink(Path(f"{root}/{d}"))]]:
+                target = Path(f"{dest}/{rel}/{file}")
+                if(file.endswith(".pth")):
+                    self.__merge_pth(Path(f"{root}/{file}"), target)
+                    continue
+                if(os.path.isdir(target) and not os.path.islink(target)):
+                    shutil.rmtree(target)
+                os.replace(Path(f"{root}/{file}"), target)
+
+    def __drop_superseded(self, src_site, dest_site):
+        if(not os.path.isdir(src_site) or not os.path.isdir(dest_site)):
+            return
+        incoming = {}
+        for entry in os.listdir(src_site):
+            if(entry.endswith(".dist-info")):
+                incoming[self.__normalise_name(entry[:-len(".dist-info")].split("-", 1)[0])] = entry
+        existing = [entry for entry in os.listdir(dest_site) if entry.endswith(".dist-info")]
+        stale = [entry for entry in existing if incoming.get(self.__normalise_name(entry[:-len(".dist-info")].split("-", 1)[0]), entry) != entry]
+        if(len(stale) == 0):
+            return
+        records, dists = self.__read_records(dest_site, skip=set(existing) - set(stale))
+        paths = set()
+        for name, dist in dists.items():
+            paths.update(dist["files"])
+            paths.add(dist["dist_info"])
+            indexed = self.dist_index.get("dists", {}).get(name)
+            if(indexed is not None and indexed.get("dist_info") == dist["dist_info"]):
+                del self.dist_index["dists"][name]
+            if(dist["dist_info"] in self.dist_index.get("scanned", [])):
+                self.dist_index["scanned"].remove(dist["dist_info"])
+        self.__delete_paths(dest_site, paths)
     
-    def __install_setuptools(self, pkg):
-        if(not os.path.exists(Path(f"{self.prefix}{self.site_prefix}"))):
-            path = Path(f"{self.prefix}{self.site_prefix}")
-            path.mkdir(parents=True)
-        pkg_json_data = ""
+    def __pypi_json(self, pkg):
+        meta_settings = self.config.obj.get("metadata", {})
+        cache_dir = Path(f"{self.config.obj['cache']['path']}/metadata")
+        cache_file = Path(f"{cache_dir}/{self.__normalise_name(pkg)}.json")
+        entry = None
         try:
-            with urllib.request.urlopen(f"https://pypi.org/pypi/{pkg}/json") as res:
-                pkg_json_data = res.read().decode("UTF-8")
-        except urllib.error.HTTPError:
-            return 1
-        pkg_json_obj = json.loads(pkg_json_data)
-        package_url = ""
-        for url in pkg_json_obj["urls"]:
-            if url["packagetype"] == "sdist" and url["python_version"] == "source":
-                package_url = url["url"]
-        pkg_version = pkg_json_obj["info"]["version"]
+            with open(cache_file, "r") as file:
+                entry = json.loads(file.read())
+        except (FileNotFoundError, ValueError):
+            entry = None
+        if(entry is not None and time.time() - entry["fetched"] < meta_settings.get("ttl", 600)):
+            os.utime(cache_file)
+            return entry["data"]
+        headers = {"Accept": "application/json"}
+        if(entry is not None and entry.get("etag")):
+            headers["If-None-Match"] = entry["etag"]
+        if(entry is not None and entry.get("last_modified")):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with urllib.request.urlopen(urllib.request.Request(f"https://pypi.org/pypi/{pkg}/json", headers=headers)) as res:
+                entry = {"etag": res.headers.get("ETag"), "last_modified": res.headers.get("Last-Modified"), "data": json.load(res)}
+        except urllib.error.HTTPError as err:
+            if(entry is None):
+                return None
+            if(err.code != 304):
+                self.console.log(f"PyPI answered {err.code}, using cached metadata for '{pkg}'", mtype="warning")
+                return entry["data"]
+        except (urllib.error.URLError, ValueError):
+            if(entry is not None):
+                self.console.log(f"Could not reach PyPI, using cached metadata for '{pkg}'", mtype="warning")
+                return entry["data"]
+            return None
+        entry["fetched"] = time.time()
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write(json.dumps(entry))
+        os.replace(tmp_path, cache_file)
+        self.__evict_lru(cache_dir, meta_settings.get("max_size", 64 * 1024 * 1024))
+        return entry["data"]
+
+    def __evict_lru(self, cache_dir, max_size):
+        entries = []
+        for file in os.listdir(cache_dir):
+            # .tmp files are other threads' writes that have not been swapped in yet
+            if(file.endswith(".tmp")):
+                continue
+            try:
+                stat = os.stat(Path(f"{cache_dir}/{file}"))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+        total_size = sum(entry[1] for entry in entries)
+        for mtime, size, file in sorted(entries):
+            if(total_size <= max_size):
+                break
+            try:
+                os.remove(Path(f"{cache_dir}/{file}"))
+            except FileNotFoundError:
+                pass
+            total_size -= size
 
+    def __prefetch_metadata(self, pkgs):
+        pkgs = [pkg for pkg in pkgs if pkg not in self.pypi_meta]
+        if(len(pkgs) < 2 or self.wheelhouse != ""):
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(pkgs))) as pool:
+            for pkg, pkg_json_obj in zip(pkgs, pool.map(self.__pypi_json, pkgs)):
+                if(pkg_json_obj is not None):
+                    self.pypi_meta[pkg] = pkg_json_obj
+
+    def __install_setuptools(self, pkg, prefix=None):
+        if(prefix is None):
+            prefix = self.prefix
+        requirement = pkg
+        pkg = re.split(r"[\s<>=!~;\[@]", pkg, maxsplit=1)[0]
+        pinned = re.search(r"[<>=!~]", requirement.split(";", 1)[0]) is not None
+        phase_start = time.perf_counter()
+        if(not os.path.exists(Path(f"{prefix}{self.site_prefix}"))):
+            path = Path(f"{prefix}{self.site_prefix}")
+            path.mkdir(parents=True)
+        package_url = ""
+        package_digest = ""
+        if(self.wheelhouse != ""):
+            sdist_path, pkg_version = self.__find_wheelhouse_sdist(pkg, requirement)
+            if(sdist_path is None):
+                self.console.log(f"Error: could not find a source distribution for '{requirement}' in wheelhouse {self.wheelhouse}", mtype="error")
+                return 1
+            package_url = sdist_path.as_uri()
+            package_digest = self.__sha256(sdist_path)
+        else:
+            pkg_json_obj = self.pypi_meta.pop(self.__requirement_name(pkg), None)
+            if(pkg_json_obj is None):
+                pkg_json_obj = self.__pypi_json(pkg)
+            if(pkg_json_obj is None):
+                return 1
+            release_files = pkg_json_obj["urls"]
+            pkg_version = pkg_json_obj["info"]["version"]
+            if(pinned):
+                # The latest release only stands in for unpinned requirements, otherwise pick the newest matching release with an sdist
+                matching = [(self.__version_key(version), version) for version, files in pkg_json_obj.get("releases", {}).items() if self.__version_allowed(requirement, version) and any(file["packagetype"] == "sdist" for file in files)]
+                if(len(matching) == 0):
+                    self.console.log(f"Error: no source distribution of package '{pkg}' matches '{requirement}'", mtype="error")
+                    return 1
+                pkg_version = max(matching)[1]
+                release_files = pkg_json_obj["releases"][pkg_version]
+            for url in release_files:
+                if url["packagetype"] == "sdist" and url["python_version"] == "source":
+                    package_url = url["url"]
+                    package_digest = url.get("digests", {}).get("sha256", "")
+        self.__trace("resolve", phase_start, pkg)
+
+        if(self.__use_cached_build(pkg, package_digest, prefix)):
+            return 0
+        phase_start = time.perf_counter()
+        build_dir = tempfile.mkdtemp(prefix=f".modi-build-{pkg}-")
         try:
             with urllib.request.urlopen(package_url) as package_req:
-                with open(f"{pkg}-{pkg_version}.tar.gz", "wb") as tarf:
-                    tarf.write(package_req.read())
-        except:
+                reader = HashingReader(package_req)
+                with tarfile.open(fileobj=reader, mode="r|gz") as tarball:
+                    tarball.extractall(build_dir)
+                reader.drain()
+        except (OSError, ValueError, tarfile.TarError):
             self.console.log(f"Error: could not resolve source download for package '{pkg}'", mtype="error")
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return 1
+        if(package_digest != "" and reader.hexdigest() != package_digest):
+            self.console.log(f"Error: source download for package '{pkg}' did not match its published sha256 digest", mtype="error")
+            shutil.rmtree(build_dir, ignore_errors=True)
             return 1
-        tarball = tarfile.open(f"{pkg}-{pkg_version}.tar.gz", mode='r:gz')
-        tarball.extractall(f".")
-        tarball.close()
-        os.remove(f"{pkg}-{pkg_version}.tar.gz")
+        self.__trace("download", phase_start, pkg, name="download and unpack sdist")
+        package_digest = reader.hexdigest()
+        if(self.__use_cached_build(pkg, package_digest, prefix)):
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return 0
+        builds_dir = Path(f"{self.config.obj['cache']['path']}/builds")
+        os.makedirs(builds_dir, exist_ok=True)
+        build_prefix = tempfile.mkdtemp(prefix=f".modi-build-{pkg}-", dir=builds_dir)
+        os.makedirs(Path(f"{build_prefix}{self.site_prefix}"), exist_ok=True)
         current_env = os.environ.copy()
-        current_env["PYTHONPATH"] = str(Path(self.prefix) / Path(self.site_prefix))
-        cwd = os.getcwd()
-        os.chdir(Path(f"./{pkg}-{pkg_version}"))
+        # setup.py must see both what it is building and what is already installed into the target
+        current_env["PYTHONPATH"] = os.pathsep.join([str(Path(f"{build_prefix}{self.site_prefix}")), str(Path(f"{prefix}{self.site_prefix}"))])
+        src_dir = Path(f"{build_dir}/{pkg}-{pkg_version}")
+        if(not os.path.isdir(src_dir)):
+            src_dir = Path(f"{build_dir}/{os.listdir(build_dir)[0]}")
         inst_result = 1
+        phase_start = time.perf_counter()
         if(self.windows):
-            inst_result = subprocess.run(f"py ./setup.py --quiet install --prefix \"{self.prefix}\"", env=dict(os.environ, PYTHONPATH=str(Path(f"{self.prefix}/{self.site_prefix}"))), shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+            inst_result = subprocess.run(f"py ./setup.py --quiet install --prefix \"{build_prefix}\"", cwd=src_dir, env=current_env, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
         else:
-            inst_result = subprocess.run(f"{sys.executable} ./setup.py --quiet install --prefix {self.prefix}", env=current_env, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            inst_result = subprocess.run([sys.executable, "./setup.py", "--quiet", "install", "--prefix", str(build_prefix)], cwd=src_dir, env=current_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         self.console.log("Finished running setup.py install", mtype="completion")
-        os.chdir(cwd)
-        shutil.rmtree(Path(f"./{pkg}-{pkg_version}"))
-        try:
-            shutil.rmtree(Path(f"./{pkg}.egg-info"))
-        except:
-            pass
-        if(inst_result.returncode == 0):
-            return 0
-        else:
+        self.__trace("build", phase_start, pkg, name="setup.py install")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        if(inst_result.returncode != 0):
+            shutil.rmtree(build_prefix, ignore_errors=True)
             return 1
+        build_path = Path(f"{builds_dir}/{package_digest}-{self.__python_tag()}")
+        if(self.config.obj["cache"].get("store", True)):
+            try:
+                os.rename(build_prefix, build_path)
+                build_prefix = build_path
+            except OSError:
+                pass
+        phase_start = time.perf_counter()
+        self.__link_tree(build_prefix, prefix)
+        self.__trace("copy", phase_start, pkg)
+        if(build_prefix != build_path):
+            shutil.rmtree(build_prefix, ignore_errors=True)
+        return 0
+
+    def __setuptools_installed(self, pkg, prefix):
+        # setup.py install leaves an egg, egg-info or bare module named after the project rather than the requirement string
+        name = self.__requirement_name(pkg)
+        site_dir = Path(f"{prefix}{self.site_prefix}")
+        if(not os.path.isdir(site_dir)):
+            return False
+        for entry in os.listdir(site_dir):
+            if(self.__normalise_name(re.sub(r"\.(py|egg|egg-info|egg-link)$", "", entry.split("-", 1)[0])) == name):
+                return True
+        return False
+
+    def __use_cached_build(self, pkg, package_digest, prefix):
+        if(package_digest == "" or not self.config.obj["cache"].get("store", True)):
+            return False
+        build_path = Path(f"{self.config.obj['cache']['path']}/builds/{package_digest}-{self.__python_tag()}")
+        if(not os.path.isdir(build_path)):
+            return False
+        self.console.log(f"Using cached build of package '{pkg}'", mtype="message")
+        phase_start = time.perf_counter()
+        self.__link_tree(build_path, prefix)
+        self.__trace("copy", phase_start, pkg, name="link cached build")
+        return True
+
+    def __link_tree(self, src, dest):
+        for root, dirs, files in os.walk(src):
+            rel = os.path.relpath(root, src)
+            os.makedirs(Path(f"{dest}/{rel}"), exist_ok=True)
+            for file in [*files, *[d for d in dirs if os.path.islink(Path(f"{root}/{d}"))]]:
+                if(file.endswith(".pth")):
+                    self.__merge_pth(Path(f"{root}/{file}"), Path(f"{dest}/{rel}/{file}"))
+                elif(not os.path.lexists(Path(f"{dest}/{rel}/{file}"))):
+                    self.__place_file(Path(f"{root}/{file}"), Path(f"{dest}/{rel}/{file}"))
+
+    def __merge_pth(self, src, dst):
+        # .pth files are shared by every package in a prefix, so merge their lines rather than linking the cached copy
+        lines = []
+        if(os.path.exists(dst)):
+            with open(dst, "r") as file:
+                lines = file.read().splitlines()
+        with open(src, "r") as file:
+            new_lines = [line for line in file.read().splitlines() if line not in lines]
+        if(len(new_lines) == 0 and os.path.exists(dst)):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dst), suffix=".tmp")
+        with os.fdopen(fd, "w") as file:
+            file.write("\n".join([*lines, *new_lines]) + "\n")
+        os.replace(tmp_path, dst)
     
 
 
@@ -0,0 +1,141 @@
+"""Minimal local stand-in for a Modi remote, for exercising download, resume, sync and publish without a real server.
+
+Usage:
+    python remote_standin.py [--port 8700] [--root ./remote] [--no-digest] [--no-ranges] [--throttle SECONDS]
+
+Then point Modi at it with 'modi.py remote set http://127.0.0.1:8700'. Packages are served from <root>/<name>.modi.pkg:
+
+    GET/HEAD /package/<name>            whole package, with ETag, Last-Modified, X-Modi-SHA256 and Accept-Ranges
+                                        honours Range, If-Range and If-None-Match (206 / 200 / 304)
+    GET      /package/<name>.sha256     hex digest sidecar
+    GET      /package/<name>/manifest   the modi.files.json inside the package
+    GET      /package/<name>/file/<p>   a single file from inside the package
+    PUT      /upload/<name>             multipart upload as sent by 'remote publish', stored in <root>
+"""
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import http.server
+import os
+import re
+import sys
+import tarfile
+import time
+import urllib.parse
+from email.utils import formatdate
+
+
+class StandinHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    root = "."
+    digest = True
+    ranges = True
+    throttle = 0.0
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"{self.command} {self.path} range={self.headers.get('Range')} if-range={self.headers.get('If-Range')}\n")
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        match = re.match(r"^/package/([^/]+?)(\.sha256)?$", self.path)
+        if(match is not None):
+            return self.__send_package(match.group(1), match.group(2) is not None, head)
+        match = re.match(r"^/package/([^/]+)/(manifest|file/(.+))$", self.path)
+        if(match is not None):
+            rel = "modi.files.json" if match.group(2) == "manifest" else urllib.parse.unquote(match.group(3))
+            return self.__send_member(match.group(1), rel, head)
+        self.__send(404, b"", head=head)
+
+    def do_PUT(self):
+        match = re.match(r"^/upload/([^/]+)$", self.path)
+        if(match is None or "Content-Length" not in self.headers):
+            return self.__send(400, b"")
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+        for part in message.iter_parts():
+            if(part.get_filename() is not None):
+                with open(os.path.join(self.root, os.path.basename(part.get_filename())), "wb") as file:
+                    file.write(part.get_payload(decode=True))
+        self.__send(200, b"")
+
+    def __send_package(self, name, sidecar, head):
+        path = os.path.join(self.root, f"{name}.modi.pkg")
+        if(not os.path.isfile(path)):
+            return self.__send(404, b"", head=head)
+        with open(path, "rb") as file:
+            data = file.read()
+        sha = hashlib.sha256(data).hexdigest()
+        if(sidecar):
+            if(not self.digest):
+                return self.__send(404, b"", head=head)
+            return self.__send(200, f"{sha}  {name}.modi.pkg\n".encode(), head=head)
+        etag = f'"{sha[:16]}"'
+        headers = {"ETag": etag, "Last-Modified": formatdate(os.path.getmtime(path), usegmt=True)}
+        if(self.digest):
+            headers["X-Modi-SHA256"] = sha
+        if(self.ranges):
+            headers["Accept-Ranges"] = "bytes"
+        if(self.headers.get("If-None-Match") == etag):
+            return self.__send(304, b"", headers, head=True)
+        requested = self.headers.get("Range")
+        if(self.headers.get("If-Range") not in [None, etag, headers["Last-Modified"]]):
+            requested = None
+        match = re.match(r"^bytes=(\d+)-(\d*)$", requested or "")
+        if(self.ranges and match is not None):
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) != "" else len(data) - 1, len(data) - 1)
+            if(start >= len(data)):
+                return self.__send(416, b"", {"Content-Range": f"bytes */{len(data)}"}, head=head)
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return self.__send(206, data[start:end + 1], headers, head=head)
+        self.__send(200, data, headers, head=head)
+
+    def __send_member(self, name, rel, head):
+        path = os.path.join(self.root, f"{name}.modi.pkg")
+        if(not os.path.isfile(path)):
+            return self.__send(404, b"", head=head)
+        with tarfile.open(path) as tar:
+            # Packages wrap their files in a single top-level folder
+            members = {member.name.split("/", 1)[1]: member for member in tar.getmembers() if member.isfile() and "/" in member.name}
+            if(rel not in members):
+                return self.__send(404, b"", head=head)
+            data = tar.extractfile(members[rel]).read()
+        self.__send(200, data, head=head)
+
+    def __send(self, status, data, headers={}, head=False):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        if(status != 304):
+            self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if(head):
+            return
+        try:
+            # Write in 1 MiB pieces so --throttle can hold a download open long enough to interrupt it
+            for i in range(0, len(data), 1024 * 1024):
+                self.wfile.write(data[i:i + 1024 * 1024])
+                if(self.throttle > 0):
+                    time.sleep(self.throttle)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Modi packages from a folder like a Modi remote")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--root", default="./remote", help="folder holding <name>.modi.pkg files")
+    parser.add_argument("--no-digest", action="store_true", help="do not advertise X-Modi-SHA256 or serve .sha256 sidecars")
+    parser.add_argument("--no-ranges", action="store_true", help="ignore Range requests and always send the whole package")
+    parser.add_argument("--throttle", type=float, default=0.0, help="seconds to pause after each MiB sent")
+    options = parser.parse_args()
+    os.makedirs(options.root, exist_ok=True)
+    StandinHandler.root = options.root
+    StandinHandler.digest = not options.no_digest
+    StandinHandler.ranges = not options.no_ranges
+    StandinHandler.throttle = options.throttle
+    print(f"Serving Modi packages from {os.path.abspath(options.root)} on http://127.0.0.1:{options.port}")
+    http.server.ThreadingHTTPServer(("127.0.0.1", options.port), StandinHandler).serve_forever()